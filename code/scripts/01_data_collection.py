@@ -1,8 +1,11 @@
 # Import libraries
-from Bio import Entrez # API for PubMed
-import json # Manipulating json files
+import datetime # Date of the harvest, for the next incremental run
 import os   # Manipulating directories and files of our Operating System
 import time # For time measures etc
+from utils.entrez import EutilsClient, fetch_pmids, search_keywords # Batched, rate-limited E-utilities access
+from utils.pubmed_xml import ParseStats, iter_articles # Streaming parser for the PubMed XML
+from utils.ledger import PmidLedger # PMIDs already fetched, for incremental runs
+from utils.raw_store import open_article_writer, write_keyword_index # Single article store + keyword index
 
 # Directory that you want to store the data.
 output_path = "../../data/raw"
@@ -11,7 +14,10 @@ output_path = "../../data/raw"
 os.makedirs(output_path, exist_ok=True)
 
 # Enter your email for Entrez API use
-Entrez.email = "yourEmail@here.you"
+email = "yourEmail@here.you"
+
+# Optional NCBI API key. It raises the allowed rate from 3 to 10 requests per second
+api_key = None
 
 # Keywords list for returning the desirable papers. We created them manually by
 # using a well known LLM.
@@ -26,49 +32,86 @@ keywords = [
 # Max returns per keyword. Change this according to your needs
 retmax = 1000 # NCBI recommends not asking for more results without special permission
 
-# Looping through keywords to search for publications
-for keyword in keywords:
-    print(f"Searching for: {keyword}")
-    try:
-        # Articles searching
-        search_handle = Entrez.esearch(db="pubmed", term=keyword, retmax=retmax)
-        search_results = Entrez.read(search_handle)
-        id_list = search_results["IdList"]
-        search_handle.close()
-
-        if not id_list:
-            print(f"No results found for: {keyword}")
-            continue
-
-        # Abstracts retreival
-        fetch_handle = Entrez.efetch(db="pubmed", id=id_list, rettype="abstract", retmode="xml")
-        records = Entrez.read(fetch_handle)
-        fetch_handle.close()
-
-        abstracts = [] # List for storing articles
-        for article in records['PubmedArticle']:
-            try:
-                pmid = article['MedlineCitation']['PMID']
-                title = article['MedlineCitation']['Article']['ArticleTitle']
-                abstract_text = article['MedlineCitation']['Article']['Abstract']['AbstractText']
-                abstract_str = ' '.join(abstract_text)
-                abstracts.append({
-                    "pmid": str(pmid),
-                    "title": title,
-                    "abstract": abstract_str
-                })
-            except Exception as e:
-                # Skip articles without abstract
-                continue
-
-        # Save in Google Drive per keyword
-        filename = os.path.join(output_path, f"{keyword.replace(' ', '_')}.json")
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(abstracts, f, ensure_ascii=False, indent=2)
-
-        print(f"A number of {len(abstracts)} abstracts have been saved for: {keyword}")
-        time.sleep(1)  # for not overloading the API
-
-    except Exception as e:
-        print(f"Error with keyword '{keyword}': {e}")
+# Compression of the article store shards: None, "gz" or "zst" (needs the zstandard package)
+compression = None
+
+# Number of PMIDs requested per efetch call
+batch_size = 200
+
+# Number of requests in flight at the same time. The requests of all workers
+# share one token bucket sized to the NCBI allowance, so more workers only
+# hide the latency of the round trips, they never exceed the rate limit.
+workers = 4
+
+# Ledger of the keyword memberships and of the PMIDs fetched so far. A rerun
+# only fetches articles that are new since the last complete run and resumes
+# after an interruption.
+ledger = PmidLedger(os.path.join(output_path, "ledger.sqlite"))
+
+# One client for all keywords. Its rate limiter replaces the fixed sleep between keywords
+client = EutilsClient(email=email, api_key=api_key)
+
+
+# Network and parse time of all efetch batches, measured separately
+parse_stats = ParseStats()
+
+
+def parse_abstracts(handle):
+    """Stream pmid, title and abstract of every article of one efetch batch."""
+    return iter_articles(handle, parse_stats)
+
+
+started = datetime.date.today()
+start = time.time()
+
+# 1. Searching every keyword first. The same article is often returned by
+# several keywords, so only the union of the PMIDs is fetched afterwards.
+search_failed = False
+new_pmids = set()
+for keyword, id_list, error in search_keywords(client, keywords, retmax, workers, ledger):
+    if error is not None:
+        print(f"Error with keyword '{keyword}': {error}")
+        search_failed = True
+        continue
+
+    if not id_list:
+        print(f"No new results found for: {keyword}")
+        continue
+
+    print(f"Found {len(id_list)} articles for: {keyword}")
+    new_pmids.update(id_list)
+
+# Fetch every PMID once, skipping the ones fetched by previous (or interrupted) runs
+to_fetch = ledger.missing(sorted(new_pmids, key=int))
+print(f"{len(new_pmids)} unique PMIDs found, {len(to_fetch)} of them not fetched yet")
+
+# 2. Fetching the abstracts in batches. Each batch is saved before its PMIDs
+# are marked as fetched, so nothing is lost if the run is interrupted.
+article_writer = open_article_writer(output_path, compression)
+fetch_failed = False
+saved = 0
+for batch, abstracts, error in fetch_pmids(client, to_fetch, batch_size, parse_abstracts, workers):
+    if error is not None:
+        print(f"Error fetching a batch of {len(batch)} PMIDs: {error}")
+        fetch_failed = True
+        continue
+
+    article_writer.write_all(abstracts)
+    article_writer.commit()
+    ledger.mark_fetched(batch)
+    saved += len(abstracts)
+
+article_writer.close()
+
+print(f"A number of {saved} new abstracts have been saved")
+
+# Keywords are only complete if all of their articles could be fetched
+if not search_failed and not fetch_failed:
+    ledger.mark_complete(keywords, started)
+
+# Keyword membership of every PMID, stored next to the article store
+write_keyword_index(output_path, ledger.keyword_index())
+ledger.close()
 
+print(f"Harvested {len(keywords)} keywords in {time.time() - start:.1f}s")
+print(f"efetch: {parse_stats.summary()}")
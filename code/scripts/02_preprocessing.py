@@ -1,62 +1,112 @@
 # Basic imports
 import os # Manipulating directories and files of our Operating System
 import json # Manipulating json files
+from multiprocessing import Pool # Cleaning chunks of abstracts in parallel
 from tqdm import tqdm # For progression bars show
 import re # Use of regular expressions
+from utils.parallel import chunks, imap_bounded # Streaming records through the process pool
+from utils.raw_store import count_articles, read_articles # Article store written by 01_data_collection.py
+from utils.shard_store import ShardWriter # Cleaned abstracts are written incrementally as JSONL shards
+from utils.near_duplicates import LshIndex, MinHasher # Near-duplicate detection
 
 # Directory with raw data
 raw_data_dir = "../../data/raw"
-all_data = []
 
-# Loading json files
-for filename in os.listdir(raw_data_dir):
-    if filename.endswith(".json"):
-        filepath = os.path.join(raw_data_dir, filename)
-        with open(filepath, 'r', encoding='utf-8') as f:
-            try:
-                entries = json.load(f)
-                all_data.extend(entries)
-            except Exception as e:
-                print(f"Error in file {filename}: {e}")
+# Output store of the cleaned abstracts (read with utils.shard_store.iter_records)
+output_dir = "../../data/cleaned/abstracts"
 
-print(f"Number of abstracts loaded: {len(all_data)}")
+# Near-duplicate abstracts (errata, reprints, ...) are collapsed into the first
+# one seen. They are detected with MinHash + LSH on word 3-grams; abstracts
+# with an estimated Jaccard similarity of at least near_dup_threshold are
+# considered the same. Set it to None to keep every abstract.
+near_dup_threshold = 0.8
+num_perm = 128
+lsh_bands = 16
 
-# Cleaning data and filtering abstracts
-cleaned_data = []
+# Which PMID every dropped near-duplicate was collapsed into
+near_dup_path = "../../data/cleaned/near_duplicates.json"
 
-for entry in tqdm(all_data):
+# Number of worker processes and abstracts sent to a worker at a time
+workers = os.cpu_count() or 1
+chunk_size = 1000
+
+# Cleaning patterns, compiled once per process
+WHITESPACE = re.compile(r'\s+')
+STRANGE_CHARACTERS = re.compile(r'[^a-zA-Z0-9Α-Ωα-ω.,;:()\[\]\'"\s]')
+
+# Same hash functions in every process, so signatures are comparable
+hasher = MinHasher(num_perm)
+
+
+def clean_entry(entry):
+    """Return the cleaned entry, or None if the abstract has to be skipped."""
     title = entry.get("title", "").strip()
     abstract = entry.get("abstract", "").strip()
 
     # Skip if one of two is missing
     if not title or not abstract:
-        continue
-    
+        return None
+
     # Extra filter to skip "fake" abstracts like "Not available."
     if abstract.lower() in ["not available.", "no abstract available."] or abstract.lower().startswith("not available"):
-        continue
+        return None
 
     # Cleaning of strange characters
-    abstract = re.sub(r'\s+', ' ', abstract)
-    abstract = re.sub(r'[^a-zA-Z0-9Α-Ωα-ω.,;:()\[\]\'"\s]', '', abstract)
+    abstract = WHITESPACE.sub(' ', abstract)
+    abstract = STRANGE_CHARACTERS.sub('', abstract)
 
-    cleaned_data.append({
+    return {
         "pmid": entry.get("pmid", ""),
         "title": title,
         "abstract": abstract
-    })
+    }
+
+
+def clean_chunk(entries):
+    """Clean a chunk of entries and compute their MinHash signatures."""
+    cleaned = []
+    for entry in entries:
+        entry = clean_entry(entry)
+        signature = None
+        if entry is not None and near_dup_threshold is not None:
+            signature = hasher.signature(entry["abstract"])
+        cleaned.append((entry, signature))
+    return cleaned
 
-print(f"Number of clear entries: {len(cleaned_data)}")
 
-# Saving in new JSON files
+if __name__ == "__main__":
+    # Streaming the article store. Every article is stored once, even if it was
+    # returned by several keywords.
+    all_data = read_articles(raw_data_dir)
+    total = count_articles(raw_data_dir)
 
-# Create cleaned directory if does not exist
-os.makedirs("../../data/cleaned", exist_ok=True)
+    print(f"Number of abstracts to load: {total}")
 
-# Saving
-output_file = "../../data/cleaned/all_abstracts_cleaned.json"
+    # Cleaning data and filtering abstracts. Chunks are cleaned by the workers
+    # and written back in input order, so the output is the same for any
+    # number of workers, and only a few chunks are in memory at any time.
+    # Near-duplicates are looked up here, in input order, so the abstract kept
+    # from every group of near-duplicates is always the same.
+    lsh_index = LshIndex(num_perm, lsh_bands, near_dup_threshold)
+    near_duplicates = {}
+    kept = 0
+    with Pool(workers) as pool, ShardWriter(output_dir, mode="w") as writer, tqdm(total=total) as progress:
+        for cleaned_chunk in imap_bounded(pool, clean_chunk, chunks(all_data, chunk_size), 2 * workers):
+            for entry, signature in cleaned_chunk:
+                if entry is None:
+                    continue
+                if signature is not None:
+                    duplicate_of = lsh_index.add(entry["pmid"], signature)
+                    if duplicate_of is not None:
+                        near_duplicates[entry["pmid"]] = duplicate_of
+                        continue
+                writer.write(entry)
+                kept += 1
+            progress.update(len(cleaned_chunk))
 
-with open(output_file, 'w', encoding='utf-8') as f:
-    json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+    with open(near_dup_path, 'w', encoding='utf-8') as f:
+        json.dump(near_duplicates, f, indent=2)
 
-print(f"Saved {len(cleaned_data)} entries in {output_file}")
+    print(f"Number of clear entries: {kept}")
+    print(f"Near-duplicates collapsed: {len(near_duplicates)} (see {near_dup_path})")
+    print(f"Saved {kept} entries in {output_dir}")
@@ -1,50 +1,125 @@
-import spacy
-import en_core_sci_lg
+import argparse
+from itertools import islice
 from tqdm import tqdm
-import json
 import os
+import time
+from utils.entity_index import EntityIndexWriter
+from utils.ner_cache import NerCache, model_key, text_hash
+from utils.parallel import chunks
+from utils.resources import load_spacy, report_timings
+from utils.shard_store import ShardWriter, count_records, iter_records
 
-# Load the pretrained SciSpaCy biomedical model
-nlp = en_core_sci_lg.load()
+# Input store of cleaned abstracts and output store of abstracts with entities
+cleaned_dir = "../../data/cleaned/abstracts"
+enriched_dir = "../../data/enriched/abstracts_with_entities"
 
-# Load cleaned abstracts (assumed already preprocessed and cleaned)
-with open("../../data/cleaned/all_abstracts_cleaned.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
+# Inverted index entity -> PMIDs of the enriched store (see utils/entity_index.py)
+entity_index_dir = "../../data/enriched/entity_index"
 
-# Output number of abstracts loaded
-print(f"Total abstracts loaded: {len(data)}")
+# Entities already extracted, keyed by (pmid, sha256 of the abstract, model).
+# Only abstracts missing from it are run through the model, so a rerun after
+# new PMIDs arrived (or after a crash) only processes the new abstracts.
+cache_path = "../../data/cache/ner_cache.sqlite"
 
-# Initialize list to store processed abstracts with entities
-enriched_data = []
+# Documents per nlp.pipe batch and number of worker processes
+batch_size = 256
+n_process = max(1, (os.cpu_count() or 1) - 1)
 
-# Process a sample (first 200 entries) for faster iteration
-for entry in tqdm(data):
-    abstract = entry["abstract"]
+# New results are committed to the cache every checkpoint_every abstracts
+checkpoint_every = 2000
 
-    # Apply the biomedical NLP pipeline on the abstract
-    doc = nlp(abstract)
+# Only the components that doc.ents depends on are run
+NER_COMPONENTS = ("tok2vec", "ner")
 
-    # Extract unique named entities with length > 2 (to skip generic short tokens)
-    entities = list(set(ent.text for ent in doc.ents if len(ent.text) > 2))
 
-    # Append the extracted entities to the original entry
-    entry["entities"] = entities
+def extract_entities(doc):
+    # Extract unique named entities with length > 2 (to skip generic short tokens),
+    # in order of first occurrence so that the output is the same on every run
+    return list(dict.fromkeys(ent.text for ent in doc.ents if len(ent.text) > 2))
 
-    # Add to final enriched dataset
-    enriched_data.append(entry)
 
-# Create the output folder if it doesn't exist
-os.makedirs("../../data/enriched", exist_ok=True)
+def cache_keys(entries):
+    return [(entry["pmid"], text_hash(entry["abstract"])) for entry in entries]
 
-# Save the enriched data (with extracted biomedical entities) to a JSON file
-with open("../../data/enriched/abstracts_with_entities.json", "w", encoding="utf-8") as f:
-    json.dump(enriched_data, f, ensure_ascii=False, indent=2)
 
-# Print confirmation message
-print("Enriched dataset saved with biomedical entities.")
+def iter_misses(cache, model, entries):
+    """Entries whose entities are not in the cache yet."""
+    for chunk in chunks(entries, 1000):
+        keys = cache_keys(chunk)
+        cached = cache.get_many(model, keys)
+        for entry, key in zip(chunk, keys):
+            if key not in cached:
+                yield entry
 
-import pandas as pd
 
-# Create a DataFrame to preview titles and extracted entities
-df = pd.DataFrame(enriched_data)
-df[["title", "entities"]].head(10)
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extract the biomedical entities of every cleaned abstract.")
+    parser.add_argument("--batch-size", type=int, default=batch_size, help="documents per nlp.pipe batch")
+    parser.add_argument("--n-process", type=int, default=n_process, help="nlp.pipe worker processes")
+    parser.add_argument("--checkpoint-every", type=int, default=checkpoint_every,
+                        help="abstracts between two commits to the cache")
+    args = parser.parse_args()
+
+    # Load the pretrained SciSpaCy biomedical model (local resource cache
+    # first, see utils/resources.py), without the tagger, lemmatizer, parser
+    # etc. that entity extraction does not need
+    nlp = load_spacy("en_core_sci_lg")
+    nlp.select_pipes(disable=[name for name in nlp.pipe_names if name not in NER_COMPONENTS])
+    print(f"Active pipes: {nlp.pipe_names}")
+    report_timings()
+    start = time.perf_counter()
+
+    cache = NerCache(cache_path)
+    model = model_key(nlp, "entities")
+
+    # Stream cleaned abstracts (assumed already preprocessed and cleaned)
+    total = count_records(cleaned_dir)
+
+    # Output number of abstracts loaded
+    print(f"Total abstracts: {total}")
+
+    # 1. Apply the biomedical NLP pipeline on the abstracts missing from the
+    # cache, in batches and across processes
+    misses = iter_misses(cache, model, iter_records(cleaned_dir))
+    docs = nlp.pipe(((entry["abstract"], entry) for entry in misses),
+                    as_tuples=True, batch_size=args.batch_size, n_process=args.n_process)
+
+    processed = 0
+    pending = []
+    for doc, entry in tqdm(docs, desc="NER"):
+        pending.append((entry["pmid"], text_hash(entry["abstract"]), extract_entities(doc)))
+        processed += 1
+
+        # Checkpoint
+        if len(pending) >= args.checkpoint_every:
+            cache.put_many(model, pending)
+            pending = []
+    cache.put_many(model, pending)
+
+    print(f"Abstracts processed: {processed}, taken from the cache: {total - processed} "
+          f"({time.perf_counter() - start:.2f}s)")
+
+    # 2. Write the enriched dataset in input order, with the entities from the
+    # cache, and the entity index of it
+    os.makedirs(os.path.dirname(enriched_dir), exist_ok=True)
+    with ShardWriter(enriched_dir, mode="w") as writer, EntityIndexWriter(entity_index_dir) as index_writer:
+        for chunk in tqdm(chunks(iter_records(cleaned_dir), 1000), total=-(-total // 1000), desc="Write"):
+            keys = cache_keys(chunk)
+            cached = cache.get_many(model, keys)
+            for entry, key in zip(chunk, keys):
+                # Append the extracted entities to the original entry
+                entry["entities"] = cached[key]
+                writer.write(entry)
+                index_writer.add(entry["pmid"], entry["entities"])
+
+    cache.close()
+
+    # Print confirmation message
+    print(f"Enriched dataset saved with biomedical entities in {enriched_dir}")
+    print(f"Entity index saved in {entity_index_dir}")
+
+    import pandas as pd
+
+    # Create a DataFrame to preview titles and extracted entities
+    df = pd.DataFrame(list(islice(iter_records(enriched_dir), 10)))
+    print(df[["title", "entities"]])
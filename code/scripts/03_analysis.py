@@ -1,36 +1,66 @@
 import json
-import pandas as pd
+import os
+from tqdm import tqdm
+from utils.entity_index import EntityIndex
+from utils.shard_store import count_records, iter_records
+from utils.sketches import ExactCounter, SketchCounter
 
 # Load enriched biomedical abstracts (with extracted entities)
-with open("../../data/enriched/abstracts_with_entities.json", "r", encoding="utf-8") as f:
-    data = json.load(f)
-
-# Convert to DataFrame for easier handling
-df = pd.DataFrame(data)
-df[["title", "entities"]].head()
-
-# Flatten all entities from all abstracts into a single list
-all_entities = [entity for entry in df["entities"] for entity in entry]
-print(f"Total entities collected: {len(all_entities)}")
-
-# Keep only entities with 2 or more words
-multi_word_entities = [ent for ent in all_entities if len(ent.split()) >= 2]
-print(f"Multi-word entities (2+ words): {len(multi_word_entities)}")
-
-from collections import Counter
-
-# Count frequency of multi-word entities
-entity_counter = Counter(multi_word_entities)
-
-# Get top 300 (Computed to have over 100 appearances)
-top_entities = entity_counter.most_common(350)
+enriched_dir = "../../data/enriched/abstracts_with_entities"
+
+# Entity index written by 02b_biomedical_entity_processing.py
+entity_index_dir = "../../data/enriched/entity_index"
+
+# How multi-word entities are counted:
+# - "exact": streaming the enriched abstracts, a counter per distinct entity
+# - "sketch": streaming, keeping only the sketch_capacity most frequent
+#   entities (SpaceSaving) and estimating document frequencies with a
+#   Count-Min sketch, in memory that does not grow with the corpus
+# - "index": read from the entity index, without scanning the corpus.
+#   Entities that only differ in case or spacing are counted together, so
+#   the counts differ from "exact" for such entities.
+count_mode = "exact"
+sketch_capacity = 20000
+
+# Top 350 (Computed to have over 100 appearances)
+top_k = 350
+
+if count_mode == "index":
+    if not os.path.exists(entity_index_dir):
+        raise FileNotFoundError(f"count_mode = \"index\" needs the entity index {entity_index_dir}; "
+                                f"build it with `python -m utils.entity_index`")
+    index = EntityIndex(entity_index_dir)
+    total_entities = index.meta["mentions"]
+
+    # Keep only entities with 2 or more words
+    multi_word_counts = index.most_common(min_words=2)
+    total_multi_word = sum(count for _, count, _ in multi_word_counts)
+    top_entities = multi_word_counts[:top_k]
+else:
+    entity_counter = ExactCounter() if count_mode == "exact" else SketchCounter(sketch_capacity)
+    total_entities = 0
+    total_multi_word = 0
+    for entry in tqdm(iter_records(enriched_dir), total=count_records(enriched_dir)):
+        entities = entry.get("entities", [])
+        total_entities += len(entities)
+
+        # Keep only entities with 2 or more words
+        multi_word_entities = [ent for ent in entities if len(ent.split()) >= 2]
+        total_multi_word += len(multi_word_entities)
+
+        # Count frequency (and number of abstracts) of multi-word entities
+        entity_counter.add_document(multi_word_entities)
+
+    # Get top entities as [entity, count, number of abstracts]
+    top_entities = entity_counter.most_common(top_k)
+
+print(f"Total entities collected: {total_entities}")
+print(f"Multi-word entities (2+ words): {total_multi_word}")
 
 # Preview top 20
 print("Top 20 multi-word entities:")
-for entity, count in top_entities[:20]:
-    print(f"{entity}: {count}")
-
-import os
+for entity, count, documents in top_entities[:20]:
+    print(f"{entity}: {count} ({documents} abstracts)")
 
 # Define output path
 output_path = "../../data/processed/top_multiword_entities.json"
@@ -79,7 +109,7 @@ import os
 
 unseen_dir= "/content/drive/MyDrive/biomedical_text_generation/data/unseen/sum_unseen.jsonl"
 
-# Folder containing: state.json, dataset_info.json, and the arrow shards
+# Folder containing the token arrays of the test split (utils/token_arrays.py)
 #TEST_DATASET_DIR = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biov2bart_sum/test"
 TEST_DATASET_DIR = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biot5_sum/test"
 
@@ -101,9 +131,9 @@ BERTSCORE_MODEL = "microsoft/BiomedNLP-BiomedBERT-base-uncased-abstract"
 LANG = "en"
 
 import json
-from datasets import load_from_disk
-ds = load_from_disk(TEST_DATASET_DIR)
-print("Loaded:", ds)
+from utils.token_arrays import TokenArrays
+ds = TokenArrays(TEST_DATASET_DIR)
+print("Loaded:", len(ds), "examples,", ds.meta)
 
 #
 jsonl_path = unseen_dir
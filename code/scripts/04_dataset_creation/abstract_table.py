@@ -0,0 +1,27 @@
+import os
+import sys
+from tqdm import tqdm
+
+# Make the shared helpers of code/scripts/utils importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.shard_store import count_records, iter_records
+from utils.text_table import TextTable, TextTableWriter
+
+from build_datasets import DATA_DIR
+
+# Cleaned abstracts (the enriched store holds the same abstracts, with entities)
+cleaned_path = os.path.join(DATA_DIR, "cleaned", "abstracts")
+
+# PMID -> abstract table the records of the training sets refer to
+table_path = os.path.join(DATA_DIR, "training", "abstracts")
+
+# Every abstract is stored once; summarization reference records only hold
+# the PMID and the prompt of every example (see utils/text_table.py)
+with TextTableWriter(table_path) as writer:
+    for entry in tqdm(iter_records(cleaned_path), total=count_records(cleaned_path)):
+        if entry.get("pmid"):
+            writer.add(entry["pmid"], entry.get("abstract") or "")
+
+meta = TextTable(table_path).meta
+print(f"Saved {meta['texts']} distinct abstracts of {meta['pmids']} PMIDs to {table_path}")
@@ -0,0 +1,81 @@
+# Builds the text_gen and QA training sets (templates.py) in a single pass
+# over the corpus. The per-dataset scripts of text_gen/ and QA/ call
+# build_datasets with their own template only, so each of them still builds
+# just its dataset.
+import argparse
+import os
+import sys
+import time
+from tqdm import tqdm
+
+# Make the shared helpers of code/scripts/utils importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from utils.dataset_builder import Template, build
+from utils.jsonl import jsonl_name
+from utils.raw_store import load_keyword_index, pmid_to_keywords as invert_keyword_index, read_articles
+from utils.shard_store import count_records, iter_records
+
+from templates import TEMPLATES
+
+# Data paths, relative to this file so that the per-dataset scripts of
+# text_gen/ and QA/ (and the other scripts of 04_dataset_creation) can use
+# them from any working directory
+DATA_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "data"))
+
+# Enriched abstracts (with entities): the corpus every template reads
+enriched_path = os.path.join(DATA_DIR, "enriched", "abstracts_with_entities")
+
+# Keyword -> PMIDs index and raw articles written by the collection stage
+raw_dir = os.path.join(DATA_DIR, "raw")
+
+# Training sets are written to <training_dir>/<text_gen|QA>/<dataset>.jsonl
+training_dir = os.path.join(DATA_DIR, "training")
+
+
+def corpus(pmid_to_keywords, pmid_to_raw_abstract):
+    """Enriched abstracts with the keywords that returned them and their raw abstract."""
+    for entry in iter_records(enriched_path):
+        entry["keywords"] = pmid_to_keywords.get(entry.get("pmid"), [])
+        entry["raw_abstract"] = pmid_to_raw_abstract.get(entry.get("pmid"))
+        yield entry
+
+
+def build_datasets(names=None):
+    """Build the datasets of the templates `names` (default: all) in one pass over the corpus."""
+    names = list(TEMPLATES) if not names else names
+    templates = []
+    for name in names:
+        subdir, dataset, examples = TEMPLATES[name]
+        templates.append(Template(name, os.path.join(training_dir, subdir, jsonl_name(dataset)), examples))
+
+    # Map every pmid to keywords that contains it
+    pmid_to_keywords = invert_keyword_index(load_keyword_index(raw_dir))
+    print(f"Collected keywords for {len(pmid_to_keywords)} abstracts.")
+
+    # Raw abstracts by PMID, only loaded for key_ent_to_text (its targets are
+    # the raw abstracts, the other templates use the cleaned ones)
+    pmid_to_raw_abstract = {}
+    if "key_ent_to_text" in names:
+        pmid_to_raw_abstract = {article["pmid"]: article.get("abstract") for article in read_articles(raw_dir)}
+
+    start = time.perf_counter()
+    records = corpus(pmid_to_keywords, pmid_to_raw_abstract)
+    counts = build(tqdm(records, total=count_records(enriched_path)), templates)
+    print(f"One pass over the corpus: {time.perf_counter() - start:.2f}s")
+
+    for template in templates:
+        print(f"Saved {counts[template.name]} examples to {os.path.normpath(template.output_path)}")
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the text_gen and QA training sets in one pass over the corpus.")
+    parser.add_argument("templates", nargs="*", help=f"templates to build (default: all of {', '.join(TEMPLATES)})")
+    args = parser.parse_args()
+
+    unknown = [name for name in args.templates if name not in TEMPLATES]
+    if unknown:
+        parser.error(f"unknown templates: {', '.join(unknown)}")
+
+    build_datasets(args.templates)
@@ -1,71 +1,125 @@
-from transformers import AutoTokenizer
-from sklearn.model_selection import train_test_split
 from datasets import Dataset
-import json
-import random
 import os
+import sys
+
+# Make the shared helpers of code/scripts/utils importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+
+from utils.jsonl import iter_jsonl, write_jsonl
+from utils.pipeline import hash_path
+from utils.resources import load_tokenizer, report_timings
+from utils.splits import SPLITS, split_jsonl
+from utils.text_table import TextTable, resolve
+from utils.token_arrays import TokenArrayWriter
+from utils.token_cache import TokenizationCache, data_fingerprint
 
 # Define input and output paths
 INPUT_PATH = "../../../../data/final_datasets/summarization_ready.jsonl"
 OUTPUT_DIR = "../../../../data/tokenized"
 UNSEEN_PATH = "../../../../data/unseen"
 
+# Train / val / test examples, split by PMID (utils/splits.py): all examples
+# of an abstract are in the same split, and a PMID always in the same one
+SPLIT_DIR = "../../../../data/final_datasets/summarization_splits"
+
+# PMID -> abstract table of the reference records ({"pmid", "input"} without
+# "target"), see utils/text_table.py
+TEXT_TABLE_PATH = "../../../../data/training/abstracts"
+
+# Tokenized datasets, one per (tokenizer, split, max length, prefix), shared by
+# the models using the same tokenizer; OUTPUT_DIR/<model>/<split> link to them
+CACHE_DIR = os.path.join(OUTPUT_DIR, "cache")
+
 #Create tokenized directory if does not exist
 os.makedirs(OUTPUT_DIR, exist_ok=True)
 
 #Create unseen directory if does not exist
 os.makedirs(UNSEEN_PATH, exist_ok=True)
 
+os.makedirs(SPLIT_DIR, exist_ok=True)
+
 # Tokenizer models
 BIOBART_MODEL = "GanjinZero/biobart-base"
 BIOT5_MODEL = "QizhiPei/biot5-base"
 BIOBART_V2_MODEL = "GanjinZero/biobart-v2-base"
 
-# Load the JSONL dataset
-with open(INPUT_PATH, 'r', encoding='utf-8') as f:
-    data = [json.loads(line) for line in f]
+# Output name -> tokenizer of every model to prepare. Adding a model only
+# tokenizes the data again if its tokenizer differs from those already cached
+# (e.g. ("bart_sum", "facebook/bart-base"), ("biot5_sum", BIOT5_MODEL)).
+MODELS = [("biobart_sum", BIOBART_MODEL), ("biov2bart_sum", BIOBART_V2_MODEL)]
+
+# Examples per tokenizer call and worker processes of the tokenization
+BATCH_SIZE = 1000
+NUM_PROC = os.cpu_count()
 
-# Shuffle the dataset
-random.shuffle(data)
+# Inputs and targets are truncated to MAX_LENGTH tokens and stored unpadded, as
+# memory-mapped token arrays (utils/token_arrays.py); batches are padded to
+# their longest example when they are assembled
+MAX_LENGTH = 512
 
-# Split into train and validation
-train_data, val_data = train_test_split(data, test_size=0.2, random_state=42)
+# Targets of reference records are only looked up when they are tokenized
+abstracts = TextTable(TEXT_TABLE_PATH) if os.path.isdir(TEXT_TABLE_PATH) else None
+if abstracts is None and any('target' not in item for item in iter_jsonl(INPUT_PATH)):
+    raise FileNotFoundError(f"{INPUT_PATH} has reference records without 'target' but there is no "
+                            f"abstract table at {TEXT_TABLE_PATH}; run 04_dataset_creation/abstract_table.py")
 
-# We will store the validation data in json form file so we can later test our models with unseen data
-with open(os.path.join(UNSEEN_PATH, "sum_unseen.json"), 'w') as f:
-    for item in val_data:
-        f.write(json.dumps(item) + '\n')
+# Split the JSONL dataset, streaming
+split_paths = {split: os.path.join(SPLIT_DIR, f"{split}.jsonl") for split in SPLITS}
+counts = split_jsonl(INPUT_PATH, split_paths)
+print("Split sizes:", counts)
+
+# We will store the test data in json form file so we can later test our models with unseen data
+write_jsonl(os.path.join(UNSEEN_PATH, "sum_unseen.json"), resolve(iter_jsonl(split_paths["test"]), abstracts))
+
+
+cache = TokenizationCache(CACHE_DIR)
+
+# Fingerprints of the splits; reference records also depend on the table, and
+# datasets stored in an earlier format must not be reused
+table_fingerprint = hash_path(TEXT_TABLE_PATH) if abstracts is not None else ""
+split_fingerprints = {split: data_fingerprint(iter_jsonl(path), table_fingerprint, "token_arrays")
+                      for split, path in split_paths.items()}
 
 
 # Helper function to tokenize and save dataset
-def tokenize_and_save(dataset, tokenizer_name, model_name, split):
-    print(f"Tokenizing for {model_name} ({split})")
-    tokenizer = AutoTokenizer.from_pretrained(tokenizer_name)
+def tokenize_and_save(tokenizer_name, model_name, split):
+    # Fast (Rust) tokenizer from the resource cache, loaded once per model (utils/resources.py)
+    tokenizer = load_tokenizer(tokenizer_name)
 
     #Add the "summarize:" prompt in the beginning of the input in T5 model case
-    if tokenizer_name == "QizhiPei/biot5-base":
-        for item in dataset:
-            item['input'] = "summarize: " + item['input']
-
-    def tokenize_fn(example):
-        return tokenizer(
-            example['input'],
-            text_target=example['target'],
-            padding="max_length",
+    prefix = "summarize: " if tokenizer_name == BIOT5_MODEL else ""
+
+    # Whole batches go through the tokenizer at once; reference records get
+    # their targets from the abstract table
+    def tokenize_fn(batch):
+        pmids = batch.get("pmid") or [None] * len(batch["input"])
+        targets = batch.get("target") or [None] * len(batch["input"])
+        encoded = tokenizer(
+            [prefix + text for text in batch["input"]],
+            text_target=[target if target is not None else abstracts[pmid] for target, pmid in zip(targets, pmids)],
             truncation=True,
-            max_length=512
+            max_length=MAX_LENGTH
         )
-
-    ds = Dataset.from_list(dataset)
-    tokenized = ds.map(tokenize_fn, batched=False)
-
+        return {"input_ids": encoded["input_ids"], "labels": encoded["labels"]}
+
+    def build(cache_dir):
+        print(f"Tokenizing for {model_name} ({split})")
+        ds = Dataset.from_json(split_paths[split])
+        tokenized = ds.map(tokenize_fn, batched=True, batch_size=BATCH_SIZE, num_proc=NUM_PROC,
+                           remove_columns=ds.column_names)
+        # Flat token arrays + offsets; attention masks and lengths follow from the offsets
+        with TokenArrayWriter(cache_dir, len(tokenizer)) as writer:
+            for columns in tokenized.iter(batch_size=BATCH_SIZE):
+                writer.add_batch(columns)
+
+    cached, hit = cache.get_or_build(tokenizer, split_fingerprints[split], MAX_LENGTH, prefix, build)
     out_dir = os.path.join(OUTPUT_DIR, model_name, split)
-    os.makedirs(out_dir, exist_ok=True)
+    cache.link(cached, out_dir)
+    print(f"{'Reused' if hit else 'Saved'} {cached} as {out_dir}\n")
 
-    tokenized.save_to_disk(out_dir)
-    print(f"Saved to {out_dir}\n")
+# Tokenize and save for every model
+for model_name, tokenizer in MODELS:
+    for split in SPLITS:
+        tokenize_and_save(tokenizer, model_name, split)
 
-# Tokenize and save for both models
-for model_name, tokenizer in [("biobart_sum", BIOBART_MODEL), ("biov2bart_sum", BIOBART_V2_MODEL) ]:
-    tokenize_and_save(train_data, tokenizer, model_name, "train")
-    tokenize_and_save(val_data, tokenizer, model_name, "val")
+report_timings()
@@ -0,0 +1,162 @@
+# Dataset templates of the text_gen and QA training sets.
+#
+# Every template is a function from an enriched abstract, with the keywords
+# that returned it added as entry["keywords"] and its raw abstract as
+# entry["raw_abstract"], to the examples built from it. build_datasets.py runs
+# them all in one pass over the corpus (utils/dataset_builder.py).
+import random
+
+
+# text_gen/entity_to_text: one example per multi-word entity
+def entity_to_text(entry):
+    pmid = entry.get("pmid")
+    abstract = entry["abstract"]
+    entities = entry.get("entities", [])
+
+    for entity in entities:
+        if len(entity.split()) < 2:
+            continue  # Skip overly generic terms
+
+        input_text = f"Write a biomedical paragraph about {entity}."
+
+        yield {
+            "pmid": pmid,
+            "entity": entity,
+            "abstract": abstract,
+            "input": input_text,
+            "target": abstract
+        }
+
+
+# text_gen/multi_entity_to_text: one example with all the multi-word entities
+def multi_entity_to_text(entry):
+    pmid = entry.get("pmid")
+    abstract = entry["abstract"]
+    entities = entry.get("entities", [])
+
+    # Filter out overly short ones and deduplicate
+    filtered_entities = list(set([ent for ent in entities if len(ent.split()) >= 2]))
+
+    if len(filtered_entities) < 2:
+        return  # We want multi-entity prompts
+
+    input_text = f"Write a biomedical paragraph using the terms: {', '.join(filtered_entities)}."
+
+    yield {
+        "pmid": pmid,
+        "entities": filtered_entities,
+        "abstract": abstract,
+        "input": input_text,
+        "target": abstract
+    }
+
+
+# Prompt creation: Ask from the model to write abstract for a keyword
+def create_prompt(keyword):
+    return f"Write an abstract about {keyword}."
+
+
+# text_gen/keywords_to_text: one example per keyword that returned the abstract
+def keywords_to_text(entry):
+    pmid = entry.get("pmid")
+    if not pmid:
+        return
+
+    for keyword in entry.get("keywords", []):
+        yield {
+            "pmid": pmid,
+            "keyword": keyword,
+            "input": create_prompt(keyword),
+            "target": entry["abstract"]
+        }
+
+
+# text_gen/multi_keywords_to_text: abstracts returned by 2+ keywords
+def multi_keywords_to_text(entry):
+    pmid = entry.get("pmid")
+    abstract = entry.get("abstract")
+
+    if not pmid or not abstract:
+        return
+
+    keywords = list(entry.get("keywords", []))
+
+    if len(keywords) < 2:
+        return  # Keep only those linked to 2+ keywords
+
+    prompt = " & ".join(keywords)
+
+    yield {
+        "pmid": pmid,
+        "keywords": keywords,
+        "input": prompt,
+        "target": abstract,
+        "abstract": abstract
+    }
+
+
+# text_gen/keywords_entities_to_text: keyword + entities prompt, per keyword,
+# with the raw (not cleaned) abstract as target
+def key_ent_to_text(entry):
+    pmid = entry.get("pmid")
+    abstract = entry.get("raw_abstract")
+
+    # Skip if abstract or PMID is missing
+    if not pmid or not abstract:
+        return
+
+    entities = entry.get("entities", [])
+    if not entities:
+        return
+
+    for keyword in entry.get("keywords", []):
+        # Compose input prompt: keyword + entities
+        all_terms = [keyword] + entities
+        input_text = ", ".join(all_terms)
+
+        yield {
+            "pmid": pmid,
+            "input": input_text,
+            "target": abstract
+        }
+
+
+# Question templates for entity-based QA
+QUESTION_TEMPLATES = [
+    "What is the role of {}?",
+    "How does {} affect cancer?",
+    "What do we know about {}?",
+    "What is {}?",
+    "How is {} used in treatment?"
+]
+
+
+# QA/qa_dataset: one question per multi-word entity
+def qa_from_entities(entry):
+    pmid = entry.get("pmid")
+    abstract = entry["abstract"]
+    entities = entry.get("entities", [])
+
+    for entity in entities:
+        if len(entity.split()) < 2:
+            continue  # Skip overly generic entities
+
+        question = random.choice(QUESTION_TEMPLATES).format(entity)
+
+        yield {
+            "pmid": pmid,
+            "context": abstract,
+            "question": question,
+            "answer": abstract  # Weak supervision: using full abstract as answer
+        }
+
+
+# Template name -> (output directory under data/training, dataset name, function)
+TEMPLATES = {
+    "entity_to_text": ("text_gen", "entity_to_text", entity_to_text),
+    "multi_entity_to_text": ("text_gen", "multi_entity_to_text", multi_entity_to_text),
+    "keywords_to_text": ("text_gen", "keywords_to_text", keywords_to_text),
+    "multi_keywords_to_text": ("text_gen", "multi_keywords_to_text", multi_keywords_to_text),
+    "key_ent_to_text": ("text_gen", "keywords_entities_to_text", key_ent_to_text),
+    "qa_from_entities": ("QA", "qa_dataset", qa_from_entities),
+}
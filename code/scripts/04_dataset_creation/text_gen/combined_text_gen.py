@@ -1,44 +1,56 @@
 import os
-import jsonlines
+from itertools import chain
 from tqdm import tqdm
+import sys
 
-# Define paths to individual datasets
-base_path = "../../../../data/training/text_gen"
+# Make the shared helpers of code/scripts/utils and 04_dataset_creation/build_datasets.py importable
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-input_files = [
-    "entity_to_text.jsonl",
-    "multi_entity_to_text.jsonl",
-    "keywords_to_text.jsonl",
-    "multi_keywords_to_text.jsonl",
-    "keywords_entities_to_text.jsonl"
-]
+from utils.dedup import deduplicate
+from utils.jsonl import iter_jsonl, jsonl_name, write_jsonl
 
-input_paths = [os.path.join(base_path, fname) for fname in input_files]
+from build_datasets import DATA_DIR
 
-# Load all entries from the jsonl files
-all_entries = []
+# Which entry to keep among duplicates: "first" or "last" seen
+keep = "last"
 
-for path in input_paths:
-    with jsonlines.open(path) as reader:
-        for obj in reader:
-            all_entries.append(obj)
+# Memory for the hashes of the entries (24 bytes each); beyond it they are
+# spilled to sorted runs in tmp_dir (None: system temporary directory)
+memory_bytes = 256 * 1024 * 1024
+tmp_dir = None
 
-print(f"Total entries before deduplication: {len(all_entries)}")
+# Define paths to individual datasets
+base_path = os.path.join(DATA_DIR, "training", "text_gen")
 
-# Remove exact duplicates based on (input, output)
-unique = {}
-for entry in all_entries:
-    key = (entry["input"], entry["target"])
-    unique[key] = entry  # overwrites duplicates
+input_files = [jsonl_name(name) for name in (
+    "entity_to_text",
+    "multi_entity_to_text",
+    "keywords_to_text",
+    "multi_keywords_to_text",
+    "keywords_entities_to_text"
+)]
 
-deduplicated = list(unique.values())
-print(f"Entries after deduplication: {len(deduplicated)}")
+input_paths = [os.path.join(base_path, fname) for fname in input_files]
+
+# Stream the entries of all the jsonl files (read twice: once to find the
+# duplicates, once to write the entries kept)
+def all_entries():
+    return tqdm(chain.from_iterable(iter_jsonl(path) for path in input_paths))
+
+# Remove exact duplicates based on (input, output): entries are identified
+# by a 128-bit hash of their input and target
+def key(entry):
+    return entry["input"], entry["target"]
 
 # Output path
-output_path = os.path.join(base_path, "combined_text_gen.jsonl")
+output_path = os.path.join(base_path, jsonl_name("combined_text_gen"))
+
+# Save to jsonl, streamed
+stats = {}
+write_jsonl(output_path, deduplicate(all_entries, key, keep, memory_bytes, tmp_dir, stats))
 
-# Save to jsonl
-with jsonlines.open(output_path, mode="w") as writer:
-    writer.write_all(deduplicated)
+print(f"Total entries before deduplication: {stats['records']}")
+print(f"Entries after deduplication: {stats['unique']} (spilled runs: {stats['runs']})")
 
 print(f" Combined dataset saved to:\n{output_path}")
@@ -107,6 +107,10 @@ else:
 
 print(f" Selected model checkpoint: {model_checkpoint}")
 
+# Batch examples of similar length together (the tokenized datasets are
+# stored unpadded by sum_tokenize.py; see utils/batching.py)
+group_by_length = True
+
 # =========================
 # Load Tokenizer & Model
 # =========================
@@ -123,12 +127,13 @@ model = AutoModelForSeq2SeqLM.from_pretrained(model_checkpoint).to(device)
 
 print(f" Model and tokenizer loaded to device: {device}")
 
-from datasets import load_from_disk
-
 # =========================
 #  Load Tokenized Datasets
 # =========================
 
+# Shared helpers of code/scripts/utils (token arrays, batching)
+SCRIPTS_DIR = "/content/drive/MyDrive/biomedical_text_generation/code/scripts"
+
 if model_choice == "biot5":
     train_path = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biot5_sum/train"
 elif model_choice == "t5":
@@ -139,27 +144,27 @@ elif model_choice == "biov2bart":
     train_path = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biov2bart_sum/train"
 
 
-# Load FULL training dataset
-full_train_dataset = load_from_disk(train_path)
+import sys
+sys.path.insert(0, SCRIPTS_DIR)
 
-# =========================
-#  Create 90/10 Split
-# =========================
-split_dataset = full_train_dataset.train_test_split(
-    test_size=0.1,   # 10% for validation
-    seed=42,
-    shuffle=True
-)
+from utils.batching import LengthBucketSampler
+from utils.token_arrays import TokenArrays
 
-train_dataset = split_dataset["train"]
-validation_dataset = split_dataset["test"]
+# Training and validation sets, split by PMID by sum_tokenize.py (no abstract
+# is in both; the test split is kept for 06_evaluation). They are memory-mapped
+# token arrays: every batch is gathered from disk straight into arrays padded
+# to its longest example (labels with -100; multiples of 8 keep the fp16
+# tensor cores busy), and the DataLoader workers share the mapped pages
+train_dataset = TokenArrays(train_path, pad_token_id=tokenizer.pad_token_id, pad_to_multiple_of=8)
+validation_dataset = TokenArrays(os.path.join(os.path.dirname(train_path), "val"),
+                                 pad_token_id=tokenizer.pad_token_id, pad_to_multiple_of=8)
 
 print(f" Train size: {len(train_dataset)}")
 print(f" Validation size: {len(validation_dataset)}")
 
-# Select only 128 first records for testing
-train_dataset = train_dataset.select(range(512))
-validation_dataset = validation_dataset.select(range(128))
+# Select only the first records for testing (None: all of them)
+train_limit = 512
+validation_limit = 128
 
 if model_choice == "biot5":
     out_dir="/content/drive/MyDrive/biomedical_text_generation/models/biot5_sum"
@@ -259,7 +264,36 @@ def compute_metrics(eval_pred):
 # Trainer Initialization
 # ============================
 
-trainer = Seq2SeqTrainer(
+from torch.utils.data import DataLoader
+
+# The padded arrays of a batch, used by torch without a copy
+def to_tensors(batch):
+    return {name: torch.from_numpy(array) for name, array in batch.items()}
+
+class TokenArraysTrainer(Seq2SeqTrainer):
+    """Seq2SeqTrainer reading whole batches from the token arrays.
+
+    The batches are index lists of a LengthBucketSampler over the stored
+    lengths; TokenArrays.__getitems__ gathers and pads each in one step.
+    """
+
+    def _token_arrays_loader(self, dataset, limit, batch_size, shuffle):
+        lengths = dataset.lengths()[:limit]
+        sampler = LengthBucketSampler(lengths, batch_size, shuffle=shuffle,
+                                      bucket_batches=50 if group_by_length else 1, seed=self.args.seed)
+        loader = DataLoader(dataset, batch_sampler=sampler, collate_fn=to_tensors,
+                            num_workers=self.args.dataloader_num_workers,
+                            pin_memory=self.args.dataloader_pin_memory)
+        return self.accelerator.prepare(loader)
+
+    def get_train_dataloader(self):
+        return self._token_arrays_loader(self.train_dataset, train_limit, self._train_batch_size, shuffle=True)
+
+    def get_eval_dataloader(self, eval_dataset=None):
+        dataset = self.eval_dataset if eval_dataset is None else eval_dataset
+        return self._token_arrays_loader(dataset, validation_limit, self.args.eval_batch_size, shuffle=False)
+
+trainer = TokenArraysTrainer(
     model=model,  # The Seq2Seq model to be fine-tuned (e.g., T5, BART)
     args=training_args,  # Training hyperparameters and behavior (batch size, epochs, save strategy etc.)
 
@@ -277,24 +311,6 @@ trainer = Seq2SeqTrainer(
     ]
 )
 
-# from transformers import DataCollatorForSeq2Seq
-
-# data_collator = DataCollatorForSeq2Seq(
-#     tokenizer=tokenizer,
-#     model=model,   # important for correct label padding (-100)
-# )
-
-# trainer = Seq2SeqTrainer(
-#     model=model,
-#     args=training_args,
-#     train_dataset=train_dataset,
-#     eval_dataset=validation_dataset,
-#     tokenizer=tokenizer,
-#     data_collator=data_collator,   # fixes the error
-#     compute_metrics=compute_metrics,
-#     callbacks=[EarlyStoppingCallback(early_stopping_patience=3)],
-# )
-
 # ===============================
 # Start Fine-Tuning
 # ===============================
@@ -40,10 +40,15 @@ from google.colab import drive
 drive.mount("/content/drive")
 
 import os
+import sys
+
+# Shared helpers of code/scripts/utils, imported by the cells below
+SCRIPTS_DIR = "/content/drive/MyDrive/biomedical_text_generation/code/scripts"
+sys.path.insert(0, SCRIPTS_DIR)
 
 unseen_dir= "/content/drive/MyDrive/biomedical_text_generation/data/unseen/sum_unseen.jsonl"
 
-# Folder containing: state.json, dataset_info.json, and the arrow shards
+# Folder containing the token arrays of the test split (utils/token_arrays.py)
 #TEST_DATASET_DIR = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biov2bart_sum/test"
 TEST_DATASET_DIR = "/content/drive/MyDrive/biomedical_text_generation/data/tokenized/biot5_sum/test"
 
@@ -65,9 +70,10 @@ BERTSCORE_MODEL = "microsoft/BiomedNLP-BiomedBERT-base-uncased-abstract"
 LANG = "en"
 
 import json
-from datasets import load_from_disk
-ds = load_from_disk(TEST_DATASET_DIR)
-print("Loaded:", ds)
+
+from utils.token_arrays import TokenArrays
+ds = TokenArrays(TEST_DATASET_DIR)
+print("Loaded:", len(ds), "examples,", ds.meta)
 
 #
 jsonl_path = unseen_dir
@@ -178,6 +184,8 @@ model = AutoModelForSeq2SeqLM.from_pretrained(CHECKPOINT_DIR).to(device)
 model.eval()
 
 from tqdm.auto import tqdm
+from utils.batching import LengthBucketSampler
+
 NUM_BEAMS = 4
 
 preds = []
@@ -192,9 +200,12 @@ print("Total references:", len(refs))
 print("Sample ref:", refs[0][:500])
 
 @torch.no_grad()
-def generate_from_tokens(batch):
-    input_ids = torch.tensor(batch["input_ids"]).to(device)
-    attn_mask = torch.tensor(batch["attention_mask"]).to(device)
+def generate_from_tokens(indices):
+    # The test set is stored unpadded: the examples are gathered from the
+    # mapped token arrays straight into arrays padded to the longest of them
+    batch = ds.batch(indices, tokenizer.pad_token_id)
+    input_ids = torch.from_numpy(batch["input_ids"]).to(device)
+    attn_mask = torch.from_numpy(batch["attention_mask"]).to(device)
 
     gen_ids = model.generate(
         input_ids=input_ids,
@@ -205,9 +216,13 @@ def generate_from_tokens(batch):
     )
     return tokenizer.batch_decode(gen_ids, skip_special_tokens=True)
 
-for i in tqdm(range(0, len(ds), BATCH_SIZE), desc="Generating"):
-    batch = ds[i:i+BATCH_SIZE]
-    preds.extend(generate_from_tokens(batch))
+# Batches of similar input lengths, longest first, so that little of every
+# batch is padding; predictions are put back in dataset order
+preds = [None] * len(ds)
+sampler = LengthBucketSampler(ds.lengths("input_ids"), BATCH_SIZE, shuffle=False)
+for indices in tqdm(sampler, total=len(sampler), desc="Generating"):
+    for i, pred in zip(indices, generate_from_tokens(indices)):
+        preds[i] = pred
 
 print("Generated:", len(preds))
 print("\nREF:", refs[0][:300])
@@ -959,9 +974,28 @@ def prf1(ref_set: set, pred_set: set):
     f1 = (2 * p * r / (p + r)) if (p + r) else 0.0
     return p, r, f1
 
+# CUIs of texts linked before are reused from the NER cache of the pipeline
+# (keyed by text hash and model), so only new texts go through the linker
+from utils.ner_cache import NerCache, model_key, text_hash
+
+ner_cache = NerCache("/content/drive/MyDrive/biomedical_text_generation/data/cache/ner_cache.sqlite")
+cui_model = model_key(nlp, "umls_cuis_top1")
+
 def extract_cui_sets(texts, batch_size=32):
     texts = pd.Series(texts).fillna("").astype(str).tolist()
-    return [cuis_from_doc(doc) for doc in nlp.pipe(texts, batch_size=batch_size)]
+    keys = [("", text_hash(t)) for t in texts]
+    cached = ner_cache.get_many(cui_model, set(keys))
+
+    # Run the linker once per distinct uncached text
+    missing = list(dict.fromkeys(t for t, key in zip(texts, keys) if key not in cached))
+    new_rows = [
+        ("", text_hash(t), sorted(cuis_from_doc(doc)))
+        for t, doc in zip(missing, nlp.pipe(missing, batch_size=batch_size))
+    ]
+    ner_cache.put_many(cui_model, new_rows)
+    cached.update({(pmid, digest): cuis for pmid, digest, cuis in new_rows})
+
+    return [set(cached[key]) for key in keys]
 
 def compare_concepts(df_in, col_ref, col_pred, name, batch_size=32):
     """
@@ -1120,9 +1154,23 @@ def prf1(ref_set: set, pred_set: set):
     f1 = (2 * p * r / (p + r)) if (p + r) else 0.0
     return p, r, f1
 
+# Same NER cache (ner_cache, cui_model) as the concept comparison above: the
+# pipeline is loaded with the same configuration, so the cached CUIs apply
 def extract_cui_sets(texts, batch_size=32):
     texts = pd.Series(texts).fillna("").astype(str).tolist()
-    return [cuis_from_doc(doc) for doc in nlp.pipe(texts, batch_size=batch_size)]
+    keys = [("", text_hash(t)) for t in texts]
+    cached = ner_cache.get_many(cui_model, set(keys))
+
+    # Run the linker once per distinct uncached text
+    missing = list(dict.fromkeys(t for t, key in zip(texts, keys) if key not in cached))
+    new_rows = [
+        ("", text_hash(t), sorted(cuis_from_doc(doc)))
+        for t, doc in zip(missing, nlp.pipe(missing, batch_size=batch_size))
+    ]
+    ner_cache.put_many(cui_model, new_rows)
+    cached.update({(pmid, digest): cuis for pmid, digest, cuis in new_rows})
+
+    return [set(cached[key]) for key in keys]
 
 def compare_concepts(df_in, col_ref, col_pred, name, batch_size=32):
     """
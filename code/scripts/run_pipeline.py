@@ -0,0 +1,117 @@
+# Runs the numbered pipeline scripts as stages with declared inputs and outputs.
+#
+#   cd code/scripts
+#   python run_pipeline.py                      # every stage that is out of date
+#   python run_pipeline.py 02c_text_reduction   # only the given stages
+#   python run_pipeline.py --force 02_preprocessing --dry-run
+#
+# A stage is rerun only if its script or one of its inputs changed since its
+# last successful run (or one of its outputs is missing). Stages that do not
+# depend on each other (e.g. 02c_text_reduction and the dataset builders) run
+# in parallel.
+# Wall time, peak RSS and output record counts of every stage are appended to
+# outputs/pipeline/metrics.jsonl, and the output of every stage is logged to
+# outputs/pipeline/<stage>.log.
+#
+# 01_data_collection has no input: being incremental, it has to be run with
+# --force to look for new articles.
+import argparse
+import os
+
+from utils.jsonl import jsonl_name
+from utils.pipeline import PipelineRunner, Stage
+
+# Script paths are relative to code/scripts, data paths to the repository root
+scripts_dir = os.path.dirname(os.path.abspath(__file__))
+root_dir = os.path.abspath(os.path.join(scripts_dir, "..", ".."))
+
+state_path = os.path.join(root_dir, "data", ".pipeline_state.json")
+log_dir = os.path.join(root_dir, "outputs", "pipeline")
+metrics_path = os.path.join(log_dir, "metrics.jsonl")
+
+RAW = ["data/raw/articles", "data/raw/keyword_index.json"]
+CLEANED = "data/cleaned/abstracts"
+ENRICHED = "data/enriched/abstracts_with_entities"
+ENTITY_INDEX = "data/enriched/entity_index"
+ABSTRACT_TABLE = "data/training/abstracts"
+TEXT_GEN = "data/training/text_gen/"
+QA = "data/training/QA/"
+
+# text_gen datasets of build_datasets, combined by combined_text_gen
+DATASETS = ["entity_to_text", "multi_entity_to_text", "keywords_to_text", "multi_keywords_to_text",
+            "keywords_entities_to_text"]
+
+STAGES = [
+    Stage("01_data_collection", "01_data_collection.py",
+          outputs=RAW),
+    Stage("02_preprocessing", "02_preprocessing.py",
+          inputs=["data/raw/articles"],
+          outputs=[CLEANED, "data/cleaned/near_duplicates.json"]),
+    Stage("02b_biomedical_entity_processing", "02b_biomedical_entity_processing.py",
+          inputs=[CLEANED],
+          outputs=[ENRICHED, ENTITY_INDEX]),
+    Stage("02c_text_reduction", "02c_text_reduction.py",
+          inputs=[ENRICHED],
+          outputs=["data/enriched/abstracts_to_text"]),
+    Stage("03_analysis", "03_analysis.py",
+          inputs=[ENRICHED, ENTITY_INDEX],
+          outputs=["data/processed/top_multiword_entities.json"]),
+    Stage("abstract_table", "04_dataset_creation/abstract_table.py",
+          inputs=[CLEANED],
+          outputs=[ABSTRACT_TABLE]),
+    # Every text_gen / QA dataset in a single pass over the corpus (the
+    # templates are in 04_dataset_creation/templates.py)
+    Stage("build_datasets", "04_dataset_creation/build_datasets.py",
+          inputs=RAW + [ENRICHED, "code/scripts/04_dataset_creation/templates.py"],
+          outputs=[TEXT_GEN + jsonl_name(name) for name in DATASETS] + [QA + jsonl_name("qa_dataset")]),
+    Stage("combined_text_gen", "04_dataset_creation/text_gen/combined_text_gen.py",
+          inputs=[TEXT_GEN + jsonl_name(name) for name in DATASETS],
+          outputs=[TEXT_GEN + jsonl_name("combined_text_gen")]),
+    Stage("sum_tokenize", "04_dataset_creation/summarization/sum_tokenize.py",
+          inputs=["data/final_datasets/summarization_ready.jsonl", ABSTRACT_TABLE],
+          outputs=["data/final_datasets/summarization_splits", "data/tokenized", "data/unseen/sum_unseen.json"]),
+]
+
+
+def print_result(metrics):
+    details = ""
+    if "wall_seconds" in metrics:
+        details = f" in {metrics['wall_seconds']}s, peak RSS {metrics['peak_rss_mb']} MB"
+        counts = ", ".join(f"{os.path.basename(path)}={count}" for path, count in metrics["records"].items()
+                           if count is not None)
+        if counts:
+            details += f", records: {counts}"
+    print(f"[{metrics['status']}] {metrics['stage']}{details}", flush=True)
+
+
+if __name__ == "__main__":
+    names = [stage.name for stage in STAGES]
+    parser = argparse.ArgumentParser(description="Run the out-of-date stages of the pipeline.")
+    parser.add_argument("stages", nargs="*", metavar="stage",
+                        help=f"stages to run (default: all): {', '.join(names)}")
+    parser.add_argument("--force", nargs="*", metavar="stage", default=None,
+                        help="rerun these stages (all selected stages if none given) even if up to date")
+    parser.add_argument("--workers", type=int, default=4, help="stages run at the same time")
+    parser.add_argument("--dry-run", action="store_true", help="only show which stages are out of date")
+    args = parser.parse_args()
+    unknown = set(args.stages + (args.force or [])) - set(names)
+    if unknown:
+        parser.error(f"unknown stages: {', '.join(sorted(unknown))}")
+
+    os.makedirs(os.path.dirname(state_path), exist_ok=True)
+    runner = PipelineRunner(STAGES, scripts_dir, root_dir, state_path, metrics_path, log_dir)
+    selected = args.stages or names
+    force = set()
+    if args.force is not None:
+        force = set(args.force or selected)
+
+    if args.dry_run:
+        for name in selected:
+            stage = runner.stages[name]
+            status = "up to date" if name not in force and runner.is_up_to_date(stage) else "to run"
+            print(f"{name}: {status} (after: {', '.join(sorted(runner.dependencies(stage))) or '-'})")
+    else:
+        results = runner.run(selected, force, args.workers, on_done=print_result)
+        failed = [name for name, metrics in results.items() if metrics["status"] not in ("ok", "skipped")]
+        if failed:
+            raise SystemExit(f"Failed or blocked stages: {', '.join(failed)} (see {log_dir})")
@@ -0,0 +1,2 @@
+# Shared helpers for the numbered pipeline scripts (the scripts themselves
+# start with a digit and therefore cannot be imported).
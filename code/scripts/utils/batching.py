@@ -0,0 +1,64 @@
+"""Length-bucketed batching of tokenized examples.
+
+Tokenized datasets are stored unpadded (utils/token_arrays.py, written by
+04_dataset_creation/summarization/sum_tokenize.py) and every batch is padded
+to its longest example when it is gathered (TokenArrays.batch).
+LengthBucketSampler groups examples of similar length into the same batch,
+so that little of a batch is padding:
+
+    sampler = LengthBucketSampler(ds.lengths("input_ids"), batch_size=16, shuffle=True, seed=42)
+    for indices in sampler:                       # a list of example indices per batch
+        batch = ds.batch(indices, pad_token_id=tokenizer.pad_token_id)
+        torch.from_numpy(batch["input_ids"])      # no copy
+
+With shuffle=True, examples are shuffled and cut into buckets of
+`bucket_batches` batches. Each bucket is sorted by length and split into
+batches, and the batch order is shuffled again. With shuffle=False, all
+examples are sorted by decreasing length (e.g. for generation; put the
+outputs back in place with the indices).
+"""
+import numpy as np
+
+# Label positions ignored by the loss
+LABEL_PAD_ID = -100
+
+
+class LengthBucketSampler:
+    """Batches of example indices, grouped by length (usable as a DataLoader batch_sampler)."""
+
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_batches=50, seed=0):
+        self.lengths = np.asarray(lengths, dtype=np.int64)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_batches = bucket_batches
+        self.seed = seed
+        # Incremented by every pass with shuffle=True, so every epoch differs
+        self.epoch = 0
+
+    def __len__(self):
+        if not self.shuffle:
+            return -(-len(self.lengths) // self.batch_size)
+        full, rest = divmod(len(self.lengths), self.batch_size * self.bucket_batches)
+        return full * self.bucket_batches + -(-rest // self.batch_size)
+
+    def _batches(self, order):
+        """Split `order` into buckets, sorted by decreasing length, and the buckets into batches."""
+        bucket = self.batch_size * self.bucket_batches if self.shuffle else max(len(order), 1)
+        batches = []
+        for start in range(0, len(order), bucket):
+            indices = order[start:start + bucket]
+            indices = indices[np.argsort(-self.lengths[indices], kind="stable")]
+            batches.extend(indices[i:i + self.batch_size] for i in range(0, len(indices), self.batch_size))
+        return batches
+
+    def __iter__(self):
+        if not self.shuffle:
+            # A single bucket: longest first (stable, so ties keep their order)
+            yield from (batch.tolist() for batch in self._batches(np.arange(len(self.lengths))))
+            return
+
+        rng = np.random.default_rng([self.seed, self.epoch])
+        self.epoch += 1
+        batches = self._batches(rng.permutation(len(self.lengths)))
+        for i in rng.permutation(len(batches)):
+            yield batches[i].tolist()
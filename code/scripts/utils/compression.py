@@ -0,0 +1,38 @@
+"""Compression of the JSONL files: none, gzip or zstd, told apart by extension.
+
+    .jsonl      plain
+    .jsonl.gz   gzip
+    .jsonl.zst  zstd (optional dependency: pip install zstandard)
+
+Shared by the shard store (utils/shard_store.py) and the dataset files
+(utils/jsonl.py).
+"""
+import gzip
+
+EXTENSIONS = {None: ".jsonl", "gz": ".jsonl.gz", "zst": ".jsonl.zst"}
+
+
+def zstandard():
+    # zstd support is optional (pip install zstandard)
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError("zstd-compressed files need the 'zstandard' package") from e
+    return zstandard
+
+
+def compress(data, compression):
+    if compression is None:
+        return data
+    if compression == "gz":
+        return gzip.compress(data)
+    if compression == "zst":
+        return zstandard().ZstdCompressor().compress(data)
+    raise ValueError(f"Unknown compression: {compression}")
+
+
+def compression_of(filename):
+    for compression, extension in EXTENSIONS.items():
+        if compression and filename.endswith(extension):
+            return compression
+    return None
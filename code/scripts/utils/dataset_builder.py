@@ -0,0 +1,37 @@
+"""Single-pass dataset builder: every corpus record is fanned out to every template.
+
+A template is a function from a corpus record to the examples built from it
+(any iterable, usually a generator), with its own output file. build() reads
+the corpus once and streams the examples of every enabled template to its
+JsonlWriter, so adding a dataset variant adds no pass over the corpus and
+memory does not grow with the size of the outputs.
+
+Usage:
+    templates = [Template("entity_to_text", "data/training/text_gen/entity_to_text.jsonl", entity_to_text),
+                 Template("qa_dataset", "data/training/QA/qa_dataset.jsonl", qa_from_entities)]
+    counts = build(iter_records(enriched_path), templates)  # name -> number of examples
+
+04_dataset_creation/build_datasets.py runs the templates of
+04_dataset_creation/templates.py.
+"""
+import contextlib
+
+from utils.jsonl import JsonlWriter
+
+
+class Template:
+    def __init__(self, name, output_path, examples):
+        self.name = name
+        self.output_path = output_path
+        self.examples = examples
+
+
+def build(records, templates, buffer_bytes=1024 * 1024):
+    """Write the examples of every template for every record; returns name -> number of examples."""
+    with contextlib.ExitStack() as stack:
+        sinks = [(template.examples, stack.enter_context(JsonlWriter(template.output_path, buffer_bytes)))
+                 for template in templates]
+        for record in records:
+            for examples, writer in sinks:
+                writer.write_all(examples(record))
+        return {template.name: writer.records for template, (_, writer) in zip(templates, sinks)}
@@ -0,0 +1,175 @@
+"""Streaming deduplication of records in bounded memory.
+
+Records are identified by a 128-bit blake2b hash of their key (e.g. the
+input and target of an example), so memory does not depend on the size of
+the keys. The first pass hashes every record and keeps (hash, record number)
+pairs, 24 bytes per record. Whenever they exceed `memory_bytes` they are
+sorted, reduced to one pair per hash and spilled to a run file on disk. The
+runs are merged to pick the record kept for every hash: the first or the
+last one seen, as configured. The kept record numbers are marked in a bitmap
+(one bit per record), and a second pass over the records yields those, in
+input order. The output is therefore deterministic and does not depend on
+the memory budget.
+
+Usage:
+    unique = deduplicate(lambda: iter_jsonl(path), key=lambda r: (r["input"], r["target"]), keep="last")
+    write_jsonl(output_path, unique)
+
+`open_records` is called twice (once per pass) and must yield the same
+records both times.
+"""
+import hashlib
+import heapq
+import os
+import shutil
+import tempfile
+from array import array
+from itertools import groupby
+from operator import itemgetter
+
+import numpy as np
+
+# Sort order of the (hash, record number) pairs
+_PAIR = np.dtype([("hi", "<u8"), ("lo", "<u8"), ("index", "<i8")])
+_PAIR_BYTES = _PAIR.itemsize
+
+# Pairs read from every run at a time while merging
+_BLOCK = 1 << 16
+
+
+def key_hash(parts):
+    """128-bit hash of a tuple of strings / numbers, as two 64-bit integers."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        data = str(part).encode("utf-8")
+        # Length prefixes keep ("ab", "c") and ("a", "bc") apart
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+    value = digest.digest()
+    return int.from_bytes(value[:8], "little"), int.from_bytes(value[8:], "little")
+
+
+def _reduce(pairs, keep):
+    """Sort pairs by hash and record number and keep one pair per hash."""
+    pairs = pairs[np.lexsort((pairs["index"], pairs["lo"], pairs["hi"]))]
+    if len(pairs) == 0:
+        return pairs
+    changed = (pairs["hi"][1:] != pairs["hi"][:-1]) | (pairs["lo"][1:] != pairs["lo"][:-1])
+    if keep == "first":
+        return pairs[np.concatenate([[True], changed])]
+    return pairs[np.concatenate([changed, [True]])]
+
+
+def _read_run(path):
+    run = np.load(path, mmap_mode="r")
+    for start in range(0, len(run), _BLOCK):
+        yield from run[start:start + _BLOCK].tolist()
+
+
+class _Bitmap:
+    def __init__(self, size):
+        self.bits = np.zeros((size + 7) // 8, dtype=np.uint8)
+
+    def set(self, indices):
+        indices = np.asarray(indices, dtype=np.int64)
+        np.bitwise_or.at(self.bits, indices >> 3, (1 << (indices & 7)).astype(np.uint8))
+
+    def __contains__(self, i):
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+
+class Deduplicator:
+    """Marks the record kept for every key; see deduplicate()."""
+
+    def __init__(self, keep="first", memory_bytes=256 * 1024 * 1024, tmp_dir=None):
+        if keep not in ("first", "last"):
+            raise ValueError(f"keep must be 'first' or 'last', not {keep!r}")
+        self.keep = keep
+        self.max_pairs = max(memory_bytes // _PAIR_BYTES, 1)
+        self.tmp_dir = tmp_dir
+        self.run_dir = None
+        self.runs = []
+        self.hi, self.lo, self.index = array("Q"), array("Q"), array("q")
+        self.records = 0
+        self.unique = 0
+
+    def add(self, parts):
+        hi, lo = key_hash(parts)
+        self.hi.append(hi)
+        self.lo.append(lo)
+        self.index.append(self.records)
+        self.records += 1
+        if len(self.index) >= self.max_pairs:
+            self._spill()
+
+    def _pairs(self):
+        pairs = np.empty(len(self.index), dtype=_PAIR)
+        if len(self.index):
+            pairs["hi"] = np.frombuffer(self.hi, dtype=np.uint64)
+            pairs["lo"] = np.frombuffer(self.lo, dtype=np.uint64)
+            pairs["index"] = np.frombuffer(self.index, dtype=np.int64)
+        self.hi, self.lo, self.index = array("Q"), array("Q"), array("q")
+        return _reduce(pairs, self.keep)
+
+    def _spill(self):
+        if self.run_dir is None:
+            self.run_dir = tempfile.mkdtemp(prefix="dedup-", dir=self.tmp_dir)
+        path = os.path.join(self.run_dir, f"run-{len(self.runs):05d}.npy")
+        np.save(path, self._pairs())
+        self.runs.append(path)
+
+    def kept(self):
+        """Bitmap of the record numbers kept, one per distinct key."""
+        bitmap = _Bitmap(self.records)
+        if not self.runs:
+            # Everything fits in memory
+            kept = self._pairs()["index"]
+            bitmap.set(kept)
+            self.unique = len(kept)
+            return bitmap
+        if len(self.index):
+            self._spill()
+
+        # Runs hold increasing record numbers and one pair per hash, so the
+        # pairs of a hash come out of the merge in record order
+        winners = []
+        self.unique = 0
+        try:
+            merged = heapq.merge(*map(_read_run, self.runs))
+            for _, group in groupby(merged, key=itemgetter(0, 1)):
+                first = last = next(group)
+                if self.keep == "last":
+                    for last in group:
+                        pass
+                winners.append((first if self.keep == "first" else last)[2])
+                self.unique += 1
+                if len(winners) >= _BLOCK:
+                    bitmap.set(winners)
+                    winners = []
+            bitmap.set(winners)
+        finally:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+            self.run_dir = None
+            self.runs = []
+        return bitmap
+
+
+def deduplicate(open_records, key, keep="first", memory_bytes=256 * 1024 * 1024, tmp_dir=None, stats=None):
+    """Yield the records of `open_records()` with distinct `key(record)`, in input order.
+
+    keep="first" keeps the first record of every key, keep="last" the last
+    one. Pairs beyond `memory_bytes` are spilled to sorted runs in `tmp_dir`
+    (default: the system temporary directory). If `stats` is a dict, it
+    receives the number of records read and kept, and of runs spilled.
+    """
+    deduplicator = Deduplicator(keep, memory_bytes, tmp_dir)
+    for record in open_records():
+        deduplicator.add(key(record))
+    spilled = len(deduplicator.runs) + (1 if deduplicator.runs and len(deduplicator.index) else 0)
+    kept = deduplicator.kept()
+    if stats is not None:
+        stats.update(records=deduplicator.records, unique=deduplicator.unique, runs=spilled)
+
+    for i, record in enumerate(open_records()):
+        if i in kept:
+            yield record
@@ -0,0 +1,181 @@
+"""Inverted index of the extracted entities: entity -> abstracts mentioning it.
+
+Entities are normalised (lowercased, whitespace collapsed) and sorted. The
+index is a directory of NumPy arrays that are memory-mapped when read:
+
+    strings.bin, strings_offsets.npy  normalised entities, utf-8, concatenated
+    forms.bin, forms_offsets.npy      first surface form seen of every entity
+    pmids.bin, pmids_offsets.npy      PMID of every document id
+    postings.npy, posting_offsets.npy document ids of every entity, ascending
+    term_freq.npy                     mentions of every entity
+    meta.json                         counts
+
+so a lookup is a binary search over the string table and reading the
+postings of an entity touches only those postings.
+
+Usage:
+    with EntityIndexWriter("data/enriched/entity_index") as writer:
+        for entry in records:
+            writer.add(entry["pmid"], entry["entities"])
+
+    index = EntityIndex("data/enriched/entity_index")
+    index.pmids("breast cancer"), index.doc_freq("breast cancer")
+
+02b_biomedical_entity_processing.py writes it next to the enriched store; it
+can be rebuilt from the store with
+    python -m utils.entity_index ../../data/enriched/abstracts_with_entities ../../data/enriched/entity_index
+"""
+import argparse
+import json
+import os
+import shutil
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from utils.string_table import StringTable, write_strings
+
+META_FILE = "meta.json"
+
+
+def normalise(entity):
+    return " ".join(entity.lower().split())
+
+
+class EntityIndexWriter:
+    """Accumulates (entity, document) pairs and writes the index on close.
+
+    Memory grows with the number of distinct entities plus 8 bytes per
+    mention; the index is written to a temporary directory and moved in
+    place, so readers never see a half-written index.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.entity_ids = {}
+        self.forms = []
+        self.pmids = []
+        self.pair_entities = array("i")
+        self.pair_docs = array("i")
+
+    def add(self, pmid, entities):
+        doc = len(self.pmids)
+        self.pmids.append(pmid)
+        for entity in entities:
+            key = normalise(entity)
+            if not key:
+                continue
+            entity_id = self.entity_ids.get(key)
+            if entity_id is None:
+                entity_id = self.entity_ids[key] = len(self.forms)
+                self.forms.append(entity)
+            self.pair_entities.append(entity_id)
+            self.pair_docs.append(doc)
+
+    def close(self):
+        keys = list(self.entity_ids)
+        # Entity ids of the written index follow the sorted order of the strings
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        rank = np.empty(len(keys), dtype=np.int64)
+        rank[order] = np.arange(len(keys))
+
+        entities = rank[np.frombuffer(self.pair_entities, dtype=np.int32)] if self.pair_entities else np.zeros(0, np.int64)
+        docs = np.frombuffer(self.pair_docs, dtype=np.int32) if self.pair_docs else np.zeros(0, np.int32)
+        term_freq = np.bincount(entities, minlength=len(keys)).astype(np.int64)
+
+        # Unique (entity, document) pairs, sorted by entity then document
+        num_docs = max(len(self.pmids), 1)
+        pairs = np.unique(entities * num_docs + docs)
+        postings = (pairs % num_docs).astype(np.int32)
+        posting_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(pairs // num_docs, minlength=len(keys)), out=posting_offsets[1:])
+
+        tmp_dir = self.directory.rstrip("/") + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        write_strings(tmp_dir, "strings", [keys[i] for i in order])
+        write_strings(tmp_dir, "forms", [self.forms[i] for i in order])
+        write_strings(tmp_dir, "pmids", self.pmids)
+        np.save(os.path.join(tmp_dir, "postings.npy"), postings)
+        np.save(os.path.join(tmp_dir, "posting_offsets.npy"), posting_offsets)
+        np.save(os.path.join(tmp_dir, "term_freq.npy"), term_freq)
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"documents": len(self.pmids), "entities": len(keys), "mentions": int(term_freq.sum())}, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(tmp_dir, self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+
+
+class EntityIndex:
+    def __init__(self, directory):
+        self.strings = StringTable(directory, "strings")
+        self.forms = StringTable(directory, "forms")
+        self.pmid_table = StringTable(directory, "pmids")
+        self.postings = np.load(os.path.join(directory, "postings.npy"), mmap_mode="r")
+        self.posting_offsets = np.load(os.path.join(directory, "posting_offsets.npy"), mmap_mode="r")
+        self.term_freqs = np.load(os.path.join(directory, "term_freq.npy"), mmap_mode="r")
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def entity_id(self, entity):
+        """Id of an entity (normalised before the lookup), or None."""
+        key = normalise(entity)
+        i = bisect_left(self.strings, key)
+        return i if i < len(self.strings) and self.strings[i] == key else None
+
+    def doc_ids(self, entity_id):
+        return self.postings[self.posting_offsets[entity_id]:self.posting_offsets[entity_id + 1]]
+
+    def pmids(self, entity):
+        """PMIDs of the abstracts mentioning `entity`, in corpus order."""
+        entity_id = self.entity_id(entity)
+        if entity_id is None:
+            return []
+        return [self.pmid_table[doc] for doc in self.doc_ids(entity_id)]
+
+    def doc_freqs(self):
+        return np.diff(self.posting_offsets)
+
+    def doc_freq(self, entity):
+        entity_id = self.entity_id(entity)
+        return 0 if entity_id is None else int(self.posting_offsets[entity_id + 1] - self.posting_offsets[entity_id])
+
+    def term_freq(self, entity):
+        entity_id = self.entity_id(entity)
+        return 0 if entity_id is None else int(self.term_freqs[entity_id])
+
+    def most_common(self, k=None, min_words=1):
+        """[(surface form, mentions, documents), ...] by decreasing mentions."""
+        candidates = np.argsort(-np.asarray(self.term_freqs), kind="stable")
+        doc_freqs = self.doc_freqs()
+        top = []
+        for entity_id in candidates:
+            if k is not None and len(top) >= k:
+                break
+            if self.strings[entity_id].count(" ") + 1 >= min_words:
+                top.append((self.forms[entity_id], int(self.term_freqs[entity_id]), int(doc_freqs[entity_id])))
+        return top
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the entity index of an enriched shard store.")
+    parser.add_argument("enriched_dir")
+    parser.add_argument("index_dir")
+    args = parser.parse_args()
+
+    from utils.shard_store import iter_records
+    with EntityIndexWriter(args.index_dir) as writer:
+        for entry in iter_records(args.enriched_dir):
+            writer.add(entry.get("pmid", ""), entry.get("entities", []))
+    print(EntityIndex(args.index_dir).meta)
@@ -0,0 +1,177 @@
+"""Batched, rate-limited access to the NCBI E-utilities (esearch / efetch).
+
+Bio.Entrez serialises every request behind a fixed global delay, so keywords
+cannot be harvested concurrently with it. This module talks to the
+E-utilities directly, shares one token bucket between all worker threads and
+splits the id lists into fixed-size efetch batches.
+
+A harvest runs in two phases: search_keywords collects the PMIDs of every
+keyword, then fetch_pmids fetches the union of them, so an article returned
+by several keywords is fetched once.
+"""
+import datetime
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Base URL of the E-utilities. Set EUTILS_URL to point the harvester to a
+# local stub (python -m utils.eutils_stub) instead of NCBI.
+EUTILS_URL = os.environ.get("EUTILS_URL", "https://eutils.ncbi.nlm.nih.gov/entrez/eutils")
+
+# esearch never returns more than 10000 ids per request
+ESEARCH_PAGE_SIZE = 10000
+
+# Fraction of the NCBI allowance actually used. Requests leave evenly spaced
+# but network jitter can bunch them up on arrival, so keep some headroom.
+RATE_HEADROOM = 0.9
+
+
+def ncbi_rate(api_key=None):
+    """Requests per second allowed by NCBI (3 without an API key, 10 with one)."""
+    return 10 if api_key else 3
+
+
+def chunked(items, size):
+    """Split a list into consecutive batches of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, at most `capacity` stored.
+
+    With the default capacity of 1 the requests are spread evenly, so no
+    one-second window ever sees more than `rate` requests.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class EutilsClient:
+    """Minimal PubMed esearch/efetch client sharing one rate limiter."""
+
+    def __init__(self, email, api_key=None, tool="biomedical-text-generation",
+                 base_url=EUTILS_URL, rate=None, max_tries=3, sleep_between_tries=15, timeout=60):
+        self.email = email
+        self.api_key = api_key
+        self.tool = tool
+        self.base_url = base_url.rstrip("/")
+        self.limiter = TokenBucket(rate or ncbi_rate(api_key) * RATE_HEADROOM)
+        self.max_tries = max_tries
+        self.sleep_between_tries = sleep_between_tries
+        self.timeout = timeout
+
+    def _open(self, endpoint, params):
+        params = dict(params, tool=self.tool, email=self.email)
+        if self.api_key:
+            params["api_key"] = self.api_key
+        data = urllib.parse.urlencode(params).encode("utf-8")
+        url = f"{self.base_url}/{endpoint}"
+
+        for attempt in range(self.max_tries):
+            # Every attempt (retries included) consumes a token
+            self.limiter.acquire()
+            try:
+                return urllib.request.urlopen(url, data=data, timeout=self.timeout)
+            except urllib.error.HTTPError as e:
+                # Only retry rate limiting and server side errors
+                if (e.code != 429 and e.code < 500) or attempt == self.max_tries - 1:
+                    raise
+            except urllib.error.URLError:
+                if attempt == self.max_tries - 1:
+                    raise
+            time.sleep(self.sleep_between_tries)
+
+    def esearch(self, term, retmax, **search):
+        """Return up to `retmax` PMIDs matching `term`, paging over esearch.
+
+        Extra keyword arguments (e.g. datetype, mindate, maxdate) are passed to esearch.
+        """
+        ids = []
+        while len(ids) < retmax:
+            page_size = min(retmax - len(ids), ESEARCH_PAGE_SIZE)
+            params = dict(search, db="pubmed", term=term, retstart=len(ids),
+                          retmax=page_size, retmode="json")
+            with self._open("esearch.fcgi", params) as response:
+                result = json.load(response)["esearchresult"]
+            page = result.get("idlist", [])
+            ids.extend(page)
+            if len(page) < page_size or len(ids) >= int(result.get("count", 0)):
+                break
+        return ids
+
+    def efetch(self, ids):
+        """Return a handle to the PubMed XML of a batch of PMIDs (to be closed by the caller).
+
+        The response is not read here, so it can be parsed while it streams in.
+        """
+        params = {"db": "pubmed", "id": ",".join(ids), "rettype": "abstract", "retmode": "xml"}
+        return self._open("efetch.fcgi", params)
+
+
+def search_keywords(client, keywords, retmax, workers=4, ledger=None):
+    """esearch several keywords concurrently.
+
+    Yields `(keyword, id_list, error)` as each search finishes. With a `ledger`
+    (utils.ledger.PmidLedger) only articles added since the last complete run
+    are searched and the results are recorded in its keyword index.
+    """
+    today = datetime.date.today()
+
+    def search(keyword):
+        params = ledger.delta_params(keyword, today) if ledger else {}
+        id_list = client.esearch(keyword, retmax, **params)
+        if ledger:
+            ledger.add_members(keyword, id_list)
+        return id_list
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(search, keyword): keyword for keyword in keywords}
+        for future in as_completed(futures):
+            keyword = futures[future]
+            try:
+                yield keyword, future.result(), None
+            except Exception as e:
+                yield keyword, [], e
+
+
+def fetch_pmids(client, pmids, batch_size, parse, workers=4):
+    """efetch `pmids` in batches of `batch_size`, several batches at once.
+
+    `parse` turns the XML stream of one efetch batch into an iterable of
+    records. Yields `(batch, records, error)` in the order of `pmids`, so the
+    caller can persist every batch (and mark it in a ledger) from one thread
+    and the stored order does not depend on network timing.
+    """
+    def fetch(batch):
+        with client.efetch(batch) as handle:
+            return list(parse(handle))
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [(batch, executor.submit(fetch, batch)) for batch in chunked(pmids, batch_size)]
+        for batch, future in futures:
+            try:
+                yield batch, future.result(), None
+            except Exception as e:
+                yield batch, [], e
@@ -0,0 +1,152 @@
+"""Local stand-in for the PubMed E-utilities, used to exercise the harvester offline.
+
+Usage (from code/scripts):
+    python -m utils.eutils_stub --port 8765 --max-rate 3
+    EUTILS_URL=http://127.0.0.1:8765 python 01_data_collection.py
+
+esearch returns a deterministic subset of a synthetic corpus for every term
+(so different keywords overlap, as real queries do) and efetch returns
+PubmedArticleSet XML for the requested ids. Requests above --max-rate per
+second are answered with HTTP 429, like NCBI does.
+"""
+import argparse
+import hashlib
+import json
+import signal
+import threading
+import time
+import urllib.parse
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from xml.sax.saxutils import escape
+
+# Same prolog as the real efetch responses (Bio.Entrez needs the DTD reference)
+XML_HEADER = (
+    "<?xml version=\"1.0\" ?>\n"
+    "<!DOCTYPE PubmedArticleSet PUBLIC \"-//NLM//DTD PubMedArticle, 1st January 2025//EN\" "
+    "\"https://dtd.nlm.nih.gov/ncbi/pubmed/out/pubmed_250101.dtd\">\n"
+)
+
+
+def term_matches(term, pmid, share):
+    # Stable pseudo-random membership of a PMID in the results of a term
+    digest = hashlib.sha1(f"{term}:{pmid}".encode("utf-8")).digest()
+    return digest[0] < 256 * share
+
+
+def article_xml(pmid):
+    # Every tenth article has no abstract, like real PubMed records
+    abstract = "" if pmid % 10 == 0 else (
+        "<Abstract>"
+        f"<AbstractText Label=\"BACKGROUND\">Synthetic abstract {pmid} about tumour biology.</AbstractText>"
+        f"<AbstractText Label=\"RESULTS\">Result <i>section</i> of article {pmid}.</AbstractText>"
+        "</Abstract>"
+    )
+    return (
+        "<PubmedArticle><MedlineCitation Status=\"MEDLINE\">"
+        f"<PMID Version=\"1\">{pmid}</PMID>"
+        "<Article>"
+        f"<ArticleTitle>Synthetic article {escape(str(pmid))}</ArticleTitle>"
+        f"{abstract}"
+        "</Article></MedlineCitation></PubmedArticle>"
+    )
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    corpus_size = 20000
+    share = 0.3
+    max_rate = 3
+    recent = deque()
+    lock = threading.Lock()
+    requests_served = 0
+    requests_throttled = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _params(self):
+        length = int(self.headers.get("Content-Length", 0))
+        query = urllib.parse.urlparse(self.path).query
+        body = self.rfile.read(length).decode("utf-8") if length else ""
+        params = urllib.parse.parse_qs(query)
+        params.update(urllib.parse.parse_qs(body))
+        return {k: v[0] for k, v in params.items()}
+
+    def _throttled(self):
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] >= 1:
+                self.recent.popleft()
+            if self.max_rate and len(self.recent) >= self.max_rate:
+                StubHandler.requests_throttled += 1
+                return True
+            self.recent.append(now)
+            StubHandler.requests_served += 1
+            return False
+
+    def _send(self, status, content_type, body):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self.do_POST()
+
+    def do_POST(self):
+        if self._throttled():
+            self._send(429, "text/plain", b"Too Many Requests")
+            return
+
+        params = self._params()
+        endpoint = urllib.parse.urlparse(self.path).path.rsplit("/", 1)[-1]
+
+        if endpoint == "esearch.fcgi":
+            term = params.get("term", "")
+            retstart = int(params.get("retstart", 0))
+            retmax = int(params.get("retmax", 20))
+            ids = [str(pmid) for pmid in range(1, self.corpus_size + 1)
+                   if term_matches(term, pmid, self.share)]
+            body = {"esearchresult": {"count": str(len(ids)),
+                                      "idlist": ids[retstart:retstart + retmax]}}
+            self._send(200, "application/json", json.dumps(body).encode("utf-8"))
+        elif endpoint == "efetch.fcgi":
+            ids = [int(pmid) for pmid in params.get("id", "").split(",") if pmid]
+            xml = XML_HEADER + "<PubmedArticleSet>" + "".join(
+                article_xml(pmid) for pmid in ids
+            ) + "</PubmedArticleSet>"
+            self._send(200, "text/xml", xml.encode("utf-8"))
+        else:
+            self._send(404, "text/plain", b"Unknown endpoint")
+
+
+def serve(port=8765, corpus_size=20000, share=0.3, max_rate=3):
+    """Start the stub in a background thread and return the server."""
+    StubHandler.corpus_size = corpus_size
+    StubHandler.share = share
+    StubHandler.max_rate = max_rate
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus-size", type=int, default=20000)
+    parser.add_argument("--share", type=float, default=0.3, help="Fraction of the corpus matched by each term")
+    parser.add_argument("--max-rate", type=int, default=3, help="Requests per second before answering 429 (0 = unlimited)")
+    args = parser.parse_args()
+
+    # Stop on SIGTERM as well, so the statistics are printed when run in the background
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+
+    server = serve(args.port, args.corpus_size, args.share, args.max_rate)
+    print(f"E-utilities stub listening on http://127.0.0.1:{args.port}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        print(f"Served {StubHandler.requests_served} requests, throttled {StubHandler.requests_throttled}")
+        server.shutdown()
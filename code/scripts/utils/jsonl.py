@@ -0,0 +1,126 @@
+"""Streaming JSONL files, optionally gzip / zstd compressed.
+
+The dataset builders of 04_dataset_creation are generators of records that
+are written straight to disk, so their memory does not grow with the size of
+their output:
+
+    with JsonlWriter(os.path.join(output_dir, jsonl_name("entity_to_text"))) as writer:
+        writer.write_all(examples(iter_records(input_path)))
+
+    for record in iter_jsonl(path):
+        ...
+
+The compression of a file follows its extension (.jsonl, .jsonl.gz,
+.jsonl.zst). jsonl_name gives the file name of a dataset for the compression
+chosen with $BTG_JSONL_COMPRESSION ("gz" or "zst"; unset: plain JSONL), which
+run_pipeline.py uses as well. Records are encoded into a buffer that is
+compressed and written every `buffer_bytes`, to a temporary file moved in
+place on close, so readers never see a half-written file.
+"""
+import gzip
+import io
+import json
+import os
+
+from utils.compression import EXTENSIONS, compression_of, zstandard
+
+# Compression of the dataset files of the builders: None, "gz" or "zst"
+COMPRESSION = os.environ.get("BTG_JSONL_COMPRESSION") or None
+
+
+def jsonl_name(name, compression=COMPRESSION):
+    """File name of the dataset `name` ("entity_to_text" -> "entity_to_text.jsonl[.gz|.zst]")."""
+    if compression not in EXTENSIONS:
+        raise ValueError(f"Unknown compression: {compression}")
+    return name + EXTENSIONS[compression]
+
+
+class JsonlWriter:
+    def __init__(self, path, buffer_bytes=1024 * 1024):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.buffer_bytes = buffer_bytes
+        self.buffer = []
+        self.buffered = 0
+        self.records = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.raw = open(self.tmp_path, "wb")
+        compression = compression_of(path)
+        if compression == "gz":
+            self.file = gzip.GzipFile(fileobj=self.raw, mode="wb", compresslevel=6)
+        elif compression == "zst":
+            self.file = zstandard().ZstdCompressor().stream_writer(self.raw, closefd=False)
+        else:
+            self.file = self.raw
+
+    def _flush_buffer(self):
+        if self.buffer:
+            self.file.write(b"".join(self.buffer))
+            self.buffer = []
+            self.buffered = 0
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.buffer.append(line)
+        self.buffered += len(line)
+        self.records += 1
+        if self.buffered >= self.buffer_bytes:
+            self._flush_buffer()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self.records
+
+    def _close_files(self):
+        if self.file is not self.raw:
+            self.file.close()
+        self.raw.close()
+
+    def close(self):
+        self._flush_buffer()
+        self._close_files()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self._close_files()
+            os.remove(self.tmp_path)
+
+
+def write_jsonl(path, records, buffer_bytes=1024 * 1024):
+    """Stream `records` (any iterable, e.g. a generator) to `path`; returns their number."""
+    with JsonlWriter(path, buffer_bytes) as writer:
+        return writer.write_all(records)
+
+
+def open_jsonl(path):
+    """Binary stream of the decompressed content of a JSONL file."""
+    compression = compression_of(path)
+    if compression == "gz":
+        return gzip.open(path, "rb")
+    if compression == "zst":
+        return zstandard().ZstdDecompressor().stream_reader(open(path, "rb"), read_across_frames=True)
+    return open(path, "rb")
+
+
+def iter_jsonl(path):
+    """Stream the records of a (possibly compressed) JSONL file."""
+    with open_jsonl(path) as f:
+        for line in io.TextIOWrapper(f, encoding="utf-8"):
+            if line.strip():
+                yield json.loads(line)
+
+
+def count_jsonl(path):
+    """Number of records of a (possibly compressed) JSONL file."""
+    with open_jsonl(path) as f:
+        return sum(1 for line in io.BufferedReader(f) if line.strip())
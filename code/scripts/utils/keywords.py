@@ -0,0 +1,215 @@
+"""Keyword extraction for the text reduction stage.
+
+CorpusKeywordExtractor computes the YAKE features of every word (casing,
+position, frequency, relatedness to its neighbours, spread over sentences)
+and the YAKE score of every candidate n-gram for a whole batch of abstracts
+at once with numpy, instead of running YAKE document by document. It returns,
+like `[kw for kw, score in yake_extractor.extract_keywords(text)]`, the `top`
+best candidates of every abstract, best first, in their original casing.
+Differences with YAKE itself: the position feature uses the mean instead of
+the median sentence of a word, sentences are split on . ! ? only, and
+near-identical candidates are not deduplicated (02c_text_reduction.py
+deduplicates overlapping phrases itself).
+
+Word statistics are computed per document, as YAKE computes them, so the
+keywords of an abstract do not depend on the other abstracts of its
+batch.
+
+make_keyword_extractor returns either this extractor or YAKE itself.
+
+Usage:
+    extract_keywords = make_keyword_extractor("corpus", n=10, top=20)
+    for batch in chunks(abstracts, 1000):
+        keywords = extract_keywords(batch)  # one list of keywords per abstract
+"""
+import re
+
+import numpy as np
+
+# Words (with inner hyphens / apostrophes) and single punctuation characters
+_TOKEN = re.compile(r"\w+(?:[-']\w+)*|[^\w\s]")
+_SENTENCE_END = {".", "!", "?"}
+
+
+def yake_stopwords(lan="en"):
+    """Stopword list shipped with YAKE."""
+    import yake
+    return set(yake.KeywordExtractor(lan=lan).stopword_set)
+
+
+def _grouped_count(keys, groups, num_groups):
+    """Number of distinct keys per group (keys and groups are parallel arrays)."""
+    pairs = np.unique(np.stack([groups, keys], axis=1), axis=0)
+    return np.bincount(pairs[:, 0], minlength=num_groups), pairs
+
+
+class CorpusKeywordExtractor:
+    def __init__(self, n=10, top=20, stopwords=None):
+        self.n = n
+        self.top = top
+        self.stopwords = yake_stopwords() if stopwords is None else set(stopwords)
+        # Vocabulary of the current batch: lowercased word -> id
+        self.vocab = {}
+
+    def _tokenize(self, texts):
+        """Flat token arrays of a batch; punctuation and numbers split candidates."""
+        columns = {name: [] for name in ("doc", "term", "sent", "chunk", "stop", "acronym", "capital",
+                                         "start", "end")}
+        num_sentences = []
+        chunk = 0
+        for doc, text in enumerate(texts):
+            sent = 0
+            sentence_start = True
+            for match in _TOKEN.finditer(text):
+                word = match.group()
+                if not (word[0].isalnum() or word[0] == "_") or any(c.isdigit() for c in word):
+                    # Punctuation, numbers and words with digits end the current candidate block
+                    chunk += 1
+                    if word in _SENTENCE_END:
+                        sent += 1 if not sentence_start else 0
+                        sentence_start = True
+                    continue
+                lower = word.lower()
+                columns["doc"].append(doc)
+                columns["term"].append(self.vocab.setdefault(lower, len(self.vocab)))
+                columns["sent"].append(sent)
+                columns["chunk"].append(chunk)
+                columns["stop"].append(lower in self.stopwords or len(word) < 3)
+                columns["acronym"].append(len(word) > 1 and word.isupper())
+                columns["capital"].append(not sentence_start and word[0].isupper())
+                columns["start"].append(match.start())
+                columns["end"].append(match.end())
+                sentence_start = False
+            num_sentences.append(sent + (0 if sentence_start else 1))
+            chunk += 1
+        tokens = {name: np.array(values, dtype=bool if name in ("stop", "acronym", "capital") else np.int64)
+                  for name, values in columns.items()}
+        return tokens, np.maximum(np.array(num_sentences, dtype=np.int64), 1)
+
+    def _word_scores(self, tokens, num_sentences):
+        """YAKE score H of every (document, word) group; lower is better."""
+        vocab_size = max(len(self.vocab), 1)
+        keys = tokens["doc"] * vocab_size + tokens["term"]
+        group_keys, group, tf = np.unique(keys, return_inverse=True, return_counts=True)
+        num_groups = len(group_keys)
+        group_doc = group_keys // vocab_size
+        group_stop = np.zeros(num_groups, dtype=bool)
+        group_stop[group] = tokens["stop"]
+
+        # Frequency, normalised by the statistics of the non-stopwords of the document
+        num_docs = len(num_sentences)
+        valid = ~group_stop
+        count = np.bincount(group_doc[valid], minlength=num_docs)
+        total = np.bincount(group_doc[valid], weights=tf[valid], minlength=num_docs)
+        total_sq = np.bincount(group_doc[valid], weights=tf[valid] ** 2.0, minlength=num_docs)
+        avg_tf = total / np.maximum(count, 1)
+        std_tf = np.sqrt(np.maximum(total_sq / np.maximum(count, 1) - avg_tf ** 2, 0))
+        max_tf = np.ones(num_docs)
+        np.maximum.at(max_tf, group_doc[valid], tf[valid])
+        doc_max_tf = max_tf[group_doc]
+        wfreq = tf / np.maximum(avg_tf + std_tf, 1e-9)[group_doc]
+
+        # Casing: acronyms and capitalised words not starting a sentence
+        tf_a = np.bincount(group, weights=tokens["acronym"], minlength=num_groups)
+        tf_n = np.bincount(group, weights=tokens["capital"], minlength=num_groups)
+        wcase = np.maximum(tf_a, tf_n) / (1.0 + np.log(tf))
+
+        # Spread over the sentences and position of the sentences it occurs in
+        sentences_of, sentence_pairs = _grouped_count(tokens["sent"], group, num_groups)
+        sentence_sum = np.bincount(sentence_pairs[:, 0], weights=sentence_pairs[:, 1], minlength=num_groups)
+        wspread = sentences_of / num_sentences[group_doc]
+        wpos = np.log(np.log(3.0 + sentence_sum / sentences_of))
+
+        # Relatedness: distinct words to the left / right over co-occurrences (window 1)
+        has_left = np.zeros(len(group), dtype=bool)
+        has_left[1:] = tokens["chunk"][1:] == tokens["chunk"][:-1]
+        left = np.flatnonzero(has_left)
+        wil = np.bincount(group[left], minlength=num_groups)
+        wdl, _ = _grouped_count(tokens["term"][left - 1], group[left], num_groups)
+        wir = np.bincount(group[left - 1], minlength=num_groups)
+        wdr, _ = _grouped_count(tokens["term"][left], group[left - 1], num_groups)
+        pwl = np.divide(wdl, wil, out=np.zeros(num_groups), where=wil > 0)
+        pwr = np.divide(wdr, wir, out=np.zeros(num_groups), where=wir > 0)
+        wrel = (0.5 + pwl * tf / doc_max_tf) + (0.5 + pwr * tf / doc_max_tf)
+
+        h = (wpos * wrel) / (wcase + wfreq / wrel + wspread / wrel)
+        return group, tf, h, has_left
+
+    def extract(self, texts):
+        """Keywords of every text, best first (at most `top` per text)."""
+        texts = list(texts)
+        # A new vocabulary per batch, so that memory does not grow with the corpus
+        self.vocab = {}
+        tokens, num_sentences = self._tokenize(texts)
+        if len(tokens["term"]) == 0:
+            return [[] for _ in texts]
+        group, tf, h, has_left = self._word_scores(tokens, num_sentences)
+        num_tokens = len(group)
+
+        # Frequency of every adjacent word pair of a document, at the position of its right word
+        vocab_size = max(len(self.vocab), 1)
+        previous = np.concatenate([[0], tokens["term"][:-1]])
+        pair_keys = (tokens["doc"] * vocab_size + previous) * vocab_size + tokens["term"]
+        pair_keys[~has_left] = -1
+        _, pair_inverse, pair_counts = np.unique(pair_keys, return_inverse=True, return_counts=True)
+        pair_tf = np.where(has_left, pair_counts[pair_inverse.ravel()], 0)
+
+        # Contribution of every position to the product / sum of the candidates containing it.
+        # Stopwords inside a candidate weigh by how strongly they bind their neighbours.
+        word_h = h[group]
+        prob_left = np.zeros(num_tokens)
+        prob_left[1:] = pair_tf[1:] / tf[group[:-1]]
+        prob_right = np.zeros(num_tokens)
+        prob_right[:-1] = pair_tf[1:] / tf[group[1:]]
+        bind = prob_left * prob_right
+        log_factor = np.where(tokens["stop"], np.log(2.0 - bind), np.log(np.maximum(word_h, 1e-300)))
+        term = np.where(tokens["stop"], bind - 1.0, word_h)
+        log_prod = np.concatenate([[0.0], np.cumsum(log_factor)])
+        h_sum = np.concatenate([[0.0], np.cumsum(term)])
+
+        docs, scores, starts, ends = [], [], [], []
+        for length in range(1, self.n + 1):
+            first = np.arange(num_tokens - length + 1)
+            last = first + length - 1
+            ok = (tokens["chunk"][first] == tokens["chunk"][last]) & ~tokens["stop"][first] & ~tokens["stop"][last]
+            first, last = first[ok], last[ok]
+            if len(first) == 0:
+                break
+            # Identify candidates by document + lowercased words
+            windows = np.stack([tokens["doc"][first]] + [tokens["term"][first + k] for k in range(length)], axis=1)
+            _, index, inverse, counts = np.unique(windows, axis=0, return_index=True, return_inverse=True,
+                                                  return_counts=True)
+            occurrence = first[index]
+            end = last[index]
+            prod = np.exp(log_prod[end + 1] - log_prod[occurrence])
+            total = h_sum[end + 1] - h_sum[occurrence]
+            docs.append(tokens["doc"][occurrence])
+            scores.append(prod / (counts * (1.0 + total)))
+            starts.append(tokens["start"][occurrence])
+            ends.append(tokens["end"][end])
+
+        keywords = [[] for _ in texts]
+        if not docs:
+            return keywords
+        docs, scores = np.concatenate(docs), np.concatenate(scores)
+        starts, ends = np.concatenate(starts), np.concatenate(ends)
+        # Ties are broken by position, so the order does not depend on the vocabulary
+        for i in np.lexsort((ends, starts, scores, docs)):
+            doc = docs[i]
+            if len(keywords[doc]) < self.top:
+                keywords[doc].append(texts[doc][starts[i]:ends[i]])
+        return keywords
+
+
+def make_keyword_extractor(method="yake", n=10, top=20):
+    """Function mapping a list of texts to their keyword lists.
+
+    method is "yake" (YAKE itself, text by text) or "corpus" (CorpusKeywordExtractor).
+    """
+    if method == "corpus":
+        return CorpusKeywordExtractor(n=n, top=top).extract
+    if method != "yake":
+        raise ValueError(f"Unknown keyword extraction method: {method}")
+    import yake
+    extractor = yake.KeywordExtractor(lan="en", n=n, top=top)
+    return lambda texts: [[kw for kw, score in extractor.extract_keywords(text)] for text in texts]
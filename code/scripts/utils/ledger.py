@@ -0,0 +1,87 @@
+"""Persistent ledger of keyword memberships and fetched PMIDs.
+
+The ledger is a small SQLite file next to the raw data. It records which
+PMIDs every keyword returned (the keyword index) and, separately, which PMIDs
+have been fetched. A PMID that several keywords return is therefore fetched
+once. It is marked only after the batch that contained it has been saved, so
+an interrupted harvest resumes where it stopped. Once a harvest has completed,
+its date is stored per keyword and later runs only ask esearch for articles
+added to PubMed since then (mindate/maxdate on the Entrez date).
+"""
+import datetime
+import sqlite3
+import threading
+from collections import defaultdict
+
+
+class PmidLedger:
+    """Thread-safe record of keyword memberships, fetched PMIDs and completed runs."""
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS keyword_pmids ("
+                "keyword TEXT NOT NULL, pmid TEXT NOT NULL, PRIMARY KEY (keyword, pmid))"
+            )
+            self.conn.execute("CREATE TABLE IF NOT EXISTS fetched_pmids (pmid TEXT PRIMARY KEY)")
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS runs (keyword TEXT PRIMARY KEY, last_complete TEXT NOT NULL)"
+            )
+
+    def delta_params(self, keyword, today=None):
+        """esearch parameters restricting a query to articles added since the last complete run."""
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT last_complete FROM runs WHERE keyword = ?", (keyword,)
+            ).fetchone()
+        if row is None:
+            return {}
+
+        # The last run day itself is queried again; the ledger filters the overlap
+        today = today or datetime.date.today()
+        return {"datetype": "edat", "mindate": row[0], "maxdate": today.strftime("%Y/%m/%d")}
+
+    def add_members(self, keyword, pmids):
+        """Record that `keyword` returned `pmids`."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO keyword_pmids (keyword, pmid) VALUES (?, ?)",
+                [(keyword, pmid) for pmid in pmids]
+            )
+
+    def missing(self, pmids):
+        """PMIDs of `pmids` not fetched yet, in their original order."""
+        with self.lock:
+            done = {pmid for (pmid,) in self.conn.execute("SELECT pmid FROM fetched_pmids")}
+        return [pmid for pmid in pmids if pmid not in done]
+
+    def mark_fetched(self, pmids):
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO fetched_pmids (pmid) VALUES (?)",
+                [(pmid,) for pmid in pmids]
+            )
+
+    def mark_complete(self, keywords, started):
+        """Record that every article of `keywords` up to the day `started` is fetched."""
+        with self.lock, self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO runs (keyword, last_complete) VALUES (?, ?)",
+                [(keyword, started.strftime("%Y/%m/%d")) for keyword in keywords]
+            )
+
+    def keyword_index(self):
+        """Map every keyword to the sorted list of PMIDs it returned."""
+        index = defaultdict(list)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT keyword, pmid FROM keyword_pmids ORDER BY keyword, CAST(pmid AS INTEGER)"
+            )
+            for keyword, pmid in rows:
+                index[keyword].append(pmid)
+        return dict(index)
+
+    def close(self):
+        self.conn.close()
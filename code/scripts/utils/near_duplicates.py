@@ -0,0 +1,100 @@
+"""MinHash signatures and an LSH index for near-duplicate abstracts.
+
+Every abstract is reduced to the set of its word shingles and summarised by a
+MinHash signature: for each of `num_perm` hash functions, the smallest hash
+of any shingle. The fraction of equal positions of two signatures estimates
+the Jaccard similarity of the shingle sets. The LSH index splits signatures
+into bands and only compares abstracts that share a whole band, so finding
+the candidates of a new abstract does not depend on corpus size.
+
+Usage:
+    hasher = MinHasher()
+    index = LshIndex(hasher.num_perm, bands=16, threshold=0.8)
+    duplicate_of = index.add(pmid, hasher.signature(abstract))  # None if new
+"""
+import re
+import zlib
+
+import numpy as np
+
+# Mersenne prime used by the universal hash functions (a * x + b) mod p
+_PRIME = (1 << 31) - 1
+
+_TOKEN = re.compile(r"\w+")
+
+
+class MinHasher:
+    """MinHash over lowercased word shingles, deterministic for a given seed."""
+
+    def __init__(self, num_perm=128, shingle_size=3, seed=1):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.randint(0, _PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, text):
+        tokens = _TOKEN.findall(text.lower())
+        n = self.shingle_size
+        if len(tokens) <= n:
+            return {" ".join(tokens)}
+        return {" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)}
+
+    def signature(self, text):
+        """MinHash signature of `text` as a uint32 array of length num_perm."""
+        hashes = np.fromiter(
+            (zlib.crc32(shingle.encode("utf-8")) & _PRIME for shingle in self.shingles(text)),
+            dtype=np.uint64
+        )
+        # (num_perm, num_shingles) matrix of permuted hashes, minimum per row
+        permuted = (self.a * hashes + self.b) % _PRIME
+        return permuted.min(axis=1).astype(np.uint32)
+
+
+def similarity(signature_a, signature_b):
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return float(np.mean(signature_a == signature_b))
+
+
+class LshIndex:
+    """Banded LSH index returning the first indexed near-duplicate of a signature.
+
+    With b bands of r rows, two abstracts of similarity s become candidates
+    with probability 1 - (1 - s^r)^b; candidates are then checked against
+    `threshold` on the full signature.
+    """
+
+    def __init__(self, num_perm=128, bands=16, threshold=0.8):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.buckets = [{} for _ in range(bands)]
+        self.signatures = {}
+
+    def _band_keys(self, signature):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def query(self, signature):
+        """Key of the first indexed near-duplicate of `signature`, or None."""
+        checked = set()
+        for band, key in self._band_keys(signature):
+            for candidate in self.buckets[band].get(key, ()):
+                if candidate in checked:
+                    continue
+                checked.add(candidate)
+                if similarity(signature, self.signatures[candidate]) >= self.threshold:
+                    return candidate
+        return None
+
+    def add(self, key, signature):
+        """Index `signature` unless it is a near-duplicate; return the key it duplicates."""
+        duplicate_of = self.query(signature)
+        if duplicate_of is not None:
+            return duplicate_of
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self.buckets[band].setdefault(band_key, []).append(key)
+        return None
@@ -0,0 +1,68 @@
+"""Persistent cache of NER / entity-linking results.
+
+Results are stored in SQLite, keyed by (pmid, sha256 of the text, model key),
+so a rerun only has to process texts that are new, whose text changed or that
+were processed with another model. Texts without a PMID (e.g. generated
+summaries) are cached under the empty PMID, i.e. by text hash alone.
+
+Usage:
+    cache = NerCache("data/cache/ner_cache.sqlite")
+    model = model_key(nlp, "entities")
+    cached = cache.get_many(model, [(pmid, text_hash(text)) for pmid, text in batch])
+    ...
+    cache.put_many(model, [(pmid, text_hash(text), entities), ...])
+"""
+import hashlib
+import json
+import os
+import sqlite3
+
+# SQLite limits the number of host parameters of a single statement
+_LOOKUP_BATCH = 400
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def model_key(nlp, task):
+    """Name and version of a spaCy pipeline plus what was extracted with it."""
+    return f"{nlp.meta.get('lang', '')}_{nlp.meta.get('name', '')}-{nlp.meta.get('version', '')}:{task}"
+
+
+class NerCache:
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        with self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "pmid TEXT NOT NULL, text_hash TEXT NOT NULL, model TEXT NOT NULL, value TEXT NOT NULL, "
+                "PRIMARY KEY (pmid, text_hash, model))"
+            )
+
+    def get_many(self, model, keys):
+        """Map every cached (pmid, text_hash) of `keys` to its stored value."""
+        found = {}
+        keys = list(keys)
+        for start in range(0, len(keys), _LOOKUP_BATCH):
+            batch = keys[start:start + _LOOKUP_BATCH]
+            condition = " OR ".join(["(pmid = ? AND text_hash = ?)"] * len(batch))
+            params = [model] + [part for key in batch for part in key]
+            rows = self.conn.execute(
+                f"SELECT pmid, text_hash, value FROM results WHERE model = ? AND ({condition})", params
+            )
+            for pmid, digest, value in rows:
+                found[(pmid, digest)] = json.loads(value)
+        return found
+
+    def put_many(self, model, rows):
+        """Store (pmid, text_hash, value) rows; the values must be JSON serialisable."""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO results (pmid, text_hash, model, value) VALUES (?, ?, ?, ?)",
+                [(pmid, digest, model, json.dumps(value, ensure_ascii=False)) for pmid, digest, value in rows]
+            )
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,30 @@
+"""Helpers for streaming records through a process pool."""
+from collections import deque
+from itertools import islice
+
+
+def chunks(iterable, size):
+    """Lazily group an iterable into lists of `size` items (the last may be shorter)."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def imap_bounded(pool, func, iterable, max_pending):
+    """Ordered pool.imap that never has more than `max_pending` tasks in flight.
+
+    multiprocessing.Pool.imap drains its input as fast as it can, so a fast
+    reader in front of slow workers ends up holding the whole input in
+    memory. Here a new item is only read once the oldest result is taken,
+    which keeps memory flat; results come back in input order.
+    """
+    pending = deque()
+    for item in iterable:
+        pending.append(pool.apply_async(func, (item,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
@@ -0,0 +1,128 @@
+"""Aho-Corasick matching of many phrases in one pass over a text.
+
+The automaton is compiled once for a list of phrases (the keywords of an
+abstract, or a corpus-wide entity vocabulary) and then finds every
+occurrence of every phrase in a text in time linear in the text length plus
+the number of matches, instead of one substring search per phrase.
+pyahocorasick is used when installed, a pure Python automaton otherwise.
+
+Usage:
+    matcher = PhraseMatcher(keywords)
+    matcher.contains_any(sentence)   # like any(kw.lower() in sentence.lower() for kw in keywords)
+    matcher.matches(text)            # indices of the phrases occurring in text
+"""
+from collections import deque
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class _Automaton:
+    """Pure Python Aho-Corasick automaton over characters."""
+
+    def __init__(self, patterns):
+        # Trie: one transition dict per state; outputs are (pattern index, length)
+        self.goto = [{}]
+        self.outputs = [[]]
+        for index, pattern in patterns:
+            state = 0
+            for char in pattern:
+                if char not in self.goto[state]:
+                    self.goto.append({})
+                    self.outputs.append([])
+                    self.goto[state][char] = len(self.goto) - 1
+                state = self.goto[state][char]
+            self.outputs[state].append((index, len(pattern)))
+
+        # Failure links, breadth first (states of depth 1 fail to the root);
+        # every state also outputs the patterns of its failure state
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self.goto[state].items():
+                queue.append(child)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[child] = self.goto[fallback].get(char, 0)
+                self.outputs[child] = self.outputs[child] + self.outputs[self.fail[child]]
+
+    def iter(self, text):
+        """Yield (end position, (pattern index, pattern length)) for every occurrence."""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        state = 0
+        for position, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for output in outputs[state]:
+                yield position, output
+
+
+class PhraseMatcher:
+    def __init__(self, phrases, ignore_case=True):
+        """Compile `phrases` (empty ones are ignored)."""
+        self.phrases = list(phrases)
+        self.ignore_case = ignore_case
+        patterns = [(index, self._normalise(phrase)) for index, phrase in enumerate(self.phrases) if phrase]
+        if ahocorasick is not None:
+            self.automaton = ahocorasick.Automaton()
+            for index, pattern in patterns:
+                # Equal patterns (e.g. differing only in case) share an entry
+                indices = self.automaton.get(pattern, (len(pattern), []))[1]
+                self.automaton.add_word(pattern, (len(pattern), indices + [index]))
+            if patterns:
+                self.automaton.make_automaton()
+            self._empty = not patterns
+        else:
+            self.automaton = _Automaton(patterns)
+            self._empty = False
+
+    def _normalise(self, text):
+        return text.lower() if self.ignore_case else text
+
+    def _raw_matches(self, text):
+        if self._empty:
+            return
+        if ahocorasick is not None:
+            for end, (length, indices) in self.automaton.iter(text):
+                for index in indices:
+                    yield end, index, length
+        else:
+            for end, (index, length) in self.automaton.iter(text):
+                yield end, index, length
+
+    def iter_matches(self, text):
+        """Yield (start, end, phrase index) for every occurrence, by end position."""
+        text = self._normalise(text)
+        for last, index, length in self._raw_matches(text):
+            yield last - length + 1, last + 1, index
+
+    def matches(self, text):
+        """Indices of the phrases occurring in `text`."""
+        return {index for _, _, index in self.iter_matches(text)}
+
+    def contains_any(self, text):
+        """True if any phrase occurs in `text`."""
+        return next(self.iter_matches(text), None) is not None
+
+
+def remove_contained(phrases):
+    """Phrases sorted longest first, without those (case-insensitively) contained in another one.
+
+    Same result as keeping, longest first, every phrase that is not a proper
+    substring of a phrase kept before it, but with a single automaton pass
+    over every phrase instead of comparing all pairs.
+    """
+    phrases_sorted = sorted(phrases, key=lambda x: -len(x))
+    lowered = [phrase.lower() for phrase in phrases_sorted]
+    matcher = PhraseMatcher(lowered, ignore_case=False)
+    contained = set()
+    for text in set(lowered):
+        for index in matcher.matches(text):
+            if lowered[index] != text:
+                contained.add(index)
+    return [phrase for index, phrase in enumerate(phrases_sorted) if index not in contained]
@@ -0,0 +1,200 @@
+"""Minimal stage runner for the numbered pipeline scripts.
+
+Every stage is a script with declared input and output paths. A stage is
+skipped when its script and the content of its inputs hash to the same
+fingerprint as on its last successful run (and its outputs still exist).
+Stages whose inputs are produced by other stages wait for them; all other
+stages run in parallel. For each stage, wall time, peak RSS and the number
+of records of its outputs are appended to a metrics file.
+"""
+import datetime
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from utils.jsonl import count_jsonl
+from utils.shard_store import MANIFEST_FILE, count_records
+
+
+class Stage:
+    def __init__(self, name, script, inputs=(), outputs=()):
+        self.name = name
+        self.script = script
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+
+
+def _hash_file(digest, path):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+
+
+def hash_path(path):
+    """Content hash of a file or directory ('missing' if it does not exist).
+
+    For shard stores only the manifest is hashed: it changes whenever
+    records are committed.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    if not os.path.exists(path):
+        return "missing"
+    if os.path.isfile(path):
+        _hash_file(digest, path)
+    elif os.path.exists(os.path.join(path, MANIFEST_FILE)):
+        _hash_file(digest, os.path.join(path, MANIFEST_FILE))
+    else:
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                file_path = os.path.join(root, name)
+                digest.update(os.path.relpath(file_path, path).encode("utf-8"))
+                _hash_file(digest, file_path)
+    return digest.hexdigest()
+
+
+def count_output_records(path):
+    """Number of records of an output: shard store, (compressed) JSONL file or JSON list."""
+    try:
+        if os.path.isdir(path) and os.path.exists(os.path.join(path, MANIFEST_FILE)):
+            return count_records(path)
+        if path.endswith((".jsonl", ".jsonl.gz", ".jsonl.zst")):
+            return count_jsonl(path)
+        if path.endswith(".json"):
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return len(data) if isinstance(data, (list, dict)) else None
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class PipelineRunner:
+    def __init__(self, stages, scripts_dir, root_dir, state_path, metrics_path, log_dir):
+        self.stages = {stage.name: stage for stage in stages}
+        self.scripts_dir = scripts_dir
+        self.root_dir = root_dir
+        self.state_path = state_path
+        self.metrics_path = metrics_path
+        self.log_dir = log_dir
+        self.lock = threading.Lock()
+
+        self.state = {}
+        if os.path.exists(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+        # Stage that produces every output path
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                self.producers[output] = stage.name
+
+    def _abs(self, path):
+        return os.path.join(self.root_dir, path)
+
+    def dependencies(self, stage):
+        return {self.producers[path] for path in stage.inputs
+                if path in self.producers and self.producers[path] != stage.name}
+
+    def fingerprint(self, stage):
+        parts = {"script": hash_path(os.path.join(self.scripts_dir, stage.script))}
+        for path in stage.inputs:
+            parts[path] = hash_path(self._abs(path))
+        return hashlib.blake2b(json.dumps(parts, sort_keys=True).encode("utf-8"), digest_size=16).hexdigest()
+
+    def is_up_to_date(self, stage):
+        outputs_exist = all(os.path.exists(self._abs(path)) for path in stage.outputs)
+        return outputs_exist and self.state.get(stage.name) == self.fingerprint(stage)
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.state_path)
+
+    def _record(self, metrics):
+        with self.lock:
+            os.makedirs(os.path.dirname(self.metrics_path), exist_ok=True)
+            with open(self.metrics_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(metrics) + "\n")
+
+    def run_stage(self, stage, force=False):
+        """Run one stage (unless up to date) and return its metrics."""
+        metrics = {"time": datetime.datetime.now().isoformat(timespec="seconds"), "stage": stage.name}
+        if not force and self.is_up_to_date(stage):
+            metrics["status"] = "skipped"
+            self._record(metrics)
+            return metrics
+
+        fingerprint = self.fingerprint(stage)
+        script_path = os.path.join(self.scripts_dir, stage.script)
+        log_path = os.path.join(self.log_dir, stage.name + ".log")
+        os.makedirs(self.log_dir, exist_ok=True)
+
+        start = time.perf_counter()
+        with open(log_path, "w", encoding="utf-8") as log:
+            # Scripts resolve their data paths relative to their own folder
+            process = subprocess.Popen([sys.executable, os.path.basename(script_path)],
+                                       cwd=os.path.dirname(script_path), stdout=log, stderr=subprocess.STDOUT)
+            # wait4 also returns the resource usage of the child (ru_maxrss in KB on Linux)
+            _, status, usage = os.wait4(process.pid, 0)
+            process.returncode = os.waitstatus_to_exitcode(status)
+        metrics["wall_seconds"] = round(time.perf_counter() - start, 3)
+        metrics["peak_rss_mb"] = round(usage.ru_maxrss / 1024, 1)
+        metrics["status"] = "ok" if process.returncode == 0 else f"failed ({process.returncode})"
+        metrics["records"] = {path: count_output_records(self._abs(path)) for path in stage.outputs}
+        metrics["log"] = log_path
+
+        if process.returncode == 0:
+            with self.lock:
+                self.state[stage.name] = fingerprint
+                self._save_state()
+        self._record(metrics)
+        return metrics
+
+    def run(self, names=None, force=(), workers=4, on_done=None):
+        """Run the selected stages (all by default) in dependency order.
+
+        Stages listed in `force` run even when up to date. A failed stage
+        stops the stages depending on it; the others carry on. Returns the
+        metrics of every stage, keyed by name.
+        """
+        selected = list(names) if names else list(self.stages)
+        todo = {name: self.dependencies(self.stages[name]) & set(selected) for name in selected}
+        results = {}
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            running = {}
+            while todo or running:
+                # Stages whose dependencies failed can never run
+                for name in [n for n, deps in todo.items()
+                             if any(results.get(d, {}).get("status", "").startswith("failed")
+                                    or results.get(d, {}).get("status") == "blocked" for d in deps)]:
+                    del todo[name]
+                    results[name] = {"stage": name, "status": "blocked"}
+                    if on_done:
+                        on_done(results[name])
+
+                ready = [name for name, deps in todo.items() if deps <= set(results)]
+                for name in ready:
+                    del todo[name]
+                    running[executor.submit(self.run_stage, self.stages[name], name in force)] = name
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        results[name] = {"stage": name, "status": f"failed ({e})"}
+                    if on_done:
+                        on_done(results[name])
+        return results
@@ -0,0 +1,122 @@
+"""Streaming parser for PubMed efetch XML.
+
+Entrez.read builds the nested dict tree of the whole response before the
+first abstract can be used. iter_articles walks the response with
+ElementTree.iterparse instead: only the current <PubmedArticle> is kept in
+memory and it is released as soon as its record has been emitted.
+
+Usage for measuring parse throughput alone on a saved efetch response:
+    python -m utils.pubmed_xml efetch_response.xml
+"""
+import sys
+import threading
+import time
+import xml.etree.ElementTree as ET
+
+
+class TimedReader:
+    """File-like wrapper that records how long the parser waited on read()."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.read_seconds = 0.0
+        self.bytes_read = 0
+
+    def read(self, size=-1):
+        start = time.perf_counter()
+        data = self.stream.read(size)
+        self.read_seconds += time.perf_counter() - start
+        self.bytes_read += len(data)
+        return data
+
+
+class ParseStats:
+    """Thread-safe totals that separate network (read) time from parse time."""
+
+    def __init__(self):
+        self.network_seconds = 0.0
+        self.parse_seconds = 0.0
+        self.bytes = 0
+        self.records = 0
+        self.lock = threading.Lock()
+
+    def add(self, network_seconds, parse_seconds, nbytes, records):
+        with self.lock:
+            self.network_seconds += network_seconds
+            self.parse_seconds += parse_seconds
+            self.bytes += nbytes
+            self.records += records
+
+    def summary(self):
+        parse = self.parse_seconds or 1e-9
+        return (f"{self.records} records, {self.bytes / 1e6:.1f} MB | "
+                f"network {self.network_seconds:.1f}s | parse {self.parse_seconds:.1f}s "
+                f"({self.records / parse:.0f} records/s, {self.bytes / 1e6 / parse:.1f} MB/s)")
+
+
+def _text(elem):
+    # Text of an element including inline markup such as <i> or <sup>
+    return "".join(elem.itertext())
+
+
+def _extract(article):
+    citation = article.find("MedlineCitation")
+    if citation is None:
+        return None
+    pmid = citation.findtext("PMID")
+    title = citation.find("Article/ArticleTitle")
+    abstract = citation.find("Article/Abstract")
+
+    # Skip articles without abstract
+    if not pmid or title is None or abstract is None:
+        return None
+
+    return {
+        "pmid": pmid.strip(),
+        "title": _text(title),
+        "abstract": " ".join(_text(part) for part in abstract.findall("AbstractText"))
+    }
+
+
+def iter_articles(stream, stats=None):
+    """Yield {pmid, title, abstract} for every article of an efetch XML stream.
+
+    If `stats` (a ParseStats) is given, read time and parse time of the
+    stream are added to it once the stream is exhausted.
+    """
+    reader = TimedReader(stream)
+    elapsed = 0.0
+    records = 0
+
+    start = time.perf_counter()
+    context = ET.iterparse(reader, events=("start", "end"))
+    root = None
+    for event, elem in context:
+        if root is None:
+            root = elem
+        if event != "end" or elem.tag != "PubmedArticle":
+            continue
+
+        record = _extract(elem)
+
+        # Drop the finished article (and anything parsed before it) from the tree
+        root.clear()
+
+        if record is not None:
+            records += 1
+            elapsed += time.perf_counter() - start
+            yield record
+            start = time.perf_counter()
+    elapsed += time.perf_counter() - start
+
+    if stats is not None:
+        stats.add(reader.read_seconds, elapsed - reader.read_seconds, reader.bytes_read, records)
+
+
+if __name__ == "__main__":
+    stats = ParseStats()
+    for path in sys.argv[1:]:
+        with open(path, "rb") as f:
+            for _ in iter_articles(f, stats):
+                pass
+    print(stats.summary())
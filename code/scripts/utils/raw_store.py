@@ -0,0 +1,53 @@
+"""Layout of the raw PubMed corpus written by 01_data_collection.py.
+
+data/raw/
+    articles/             every fetched article once, as a JSONL shard store
+                          (see utils/shard_store.py)
+    keyword_index.json    keyword -> sorted list of the PMIDs it returned
+    ledger.sqlite         harvest bookkeeping (see utils/ledger.py)
+"""
+import json
+import os
+from collections import defaultdict
+
+from utils.shard_store import ShardWriter, count_records, iter_records
+
+ARTICLES_DIR = "articles"
+KEYWORD_INDEX_FILE = "keyword_index.json"
+
+
+def open_article_writer(raw_dir, compression=None, max_shard_bytes=64 * 1024 * 1024):
+    """ShardWriter appending to the article store (commit() after every batch)."""
+    return ShardWriter(os.path.join(raw_dir, ARTICLES_DIR), max_shard_bytes, compression)
+
+
+def read_articles(raw_dir):
+    """Stream the articles of the article store one at a time."""
+    return iter_records(os.path.join(raw_dir, ARTICLES_DIR))
+
+
+def count_articles(raw_dir):
+    return count_records(os.path.join(raw_dir, ARTICLES_DIR))
+
+
+def write_keyword_index(raw_dir, index):
+    path = os.path.join(raw_dir, KEYWORD_INDEX_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def load_keyword_index(raw_dir):
+    """Map every keyword to the PMIDs it returned."""
+    with open(os.path.join(raw_dir, KEYWORD_INDEX_FILE), "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def pmid_to_keywords(index):
+    """Invert a keyword index into PMID -> sorted list of keywords."""
+    mapping = defaultdict(list)
+    for keyword in sorted(index):
+        for pmid in index[keyword]:
+            mapping[pmid].append(keyword)
+    return dict(mapping)
@@ -0,0 +1,181 @@
+"""Local cache of NLTK data, spaCy models and Hugging Face tokenizers, loaded lazily.
+
+Stages look their resources up in a vendored cache directory first
+(`resources/` at the repository root, or $BTG_RESOURCE_DIR), so they start
+on machines without network access once the cache has been filled with
+
+    cd code/scripts
+    python -m utils.resources                       # every resource of the pipeline
+    python -m utils.resources --spacy en_core_sci_lg --tokenizers GanjinZero/biobart-base
+
+on a machine that has it. With $BTG_OFFLINE set, missing resources raise an
+error instead of being downloaded.
+
+Heavy modules are only imported when a resource is loaded, and the time spent
+importing modules and loading models is recorded separately in `timings`
+(printed by report_timings), so `--help` and dry runs stay fast.
+"""
+import argparse
+import contextlib
+import importlib
+import os
+import sys
+import time
+
+RESOURCE_DIR = os.environ.get(
+    "BTG_RESOURCE_DIR",
+    os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "resources"))
+)
+NLTK_DIR = os.path.join(RESOURCE_DIR, "nltk_data")
+SPACY_DIR = os.path.join(RESOURCE_DIR, "spacy")
+TOKENIZER_DIR = os.path.join(RESOURCE_DIR, "tokenizers")
+
+# NLTK resources of the pipeline: name -> path checked by nltk.data.find
+NLTK_RESOURCES = {
+    "punkt": "tokenizers/punkt",
+    "punkt_tab": "tokenizers/punkt_tab/english/",
+}
+SPACY_MODELS = ["en_core_sci_lg"]
+TOKENIZERS = ["GanjinZero/biobart-base", "GanjinZero/biobart-v2-base", "QizhiPei/biot5-base"]
+
+# Seconds spent on every import / model load of this process, by label
+timings = {}
+
+
+def offline():
+    return os.environ.get("BTG_OFFLINE", "") not in ("", "0")
+
+
+@contextlib.contextmanager
+def timed(label):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[label] = timings.get(label, 0.0) + time.perf_counter() - start
+
+
+def lazy_import(module):
+    """Import `module`, timing the first import."""
+    if module not in sys.modules:
+        with timed(f"import {module}"):
+            importlib.import_module(module)
+    return sys.modules[module]
+
+
+def report_timings():
+    for label, seconds in timings.items():
+        print(f"  {label}: {seconds:.2f}s")
+
+
+def _nltk():
+    """nltk, searching the local cache before its default data directories."""
+    nltk = lazy_import("nltk")
+    if NLTK_DIR not in nltk.data.path:
+        nltk.data.path.insert(0, NLTK_DIR)
+    return nltk
+
+
+def ensure_nltk(*names):
+    """Make NLTK resources available from the local cache, downloading missing ones."""
+    nltk = _nltk()
+    for name in names:
+        try:
+            nltk.data.find(NLTK_RESOURCES[name])
+        except LookupError:
+            if offline():
+                raise LookupError(f"NLTK resource '{name}' is not in {NLTK_DIR}; "
+                                  f"run `python -m utils.resources` on a machine with network access")
+            with timed(f"download {name}"):
+                nltk.download(name, download_dir=NLTK_DIR, quiet=True)
+            # nltk.download reports failures (e.g. no network) without raising
+            try:
+                nltk.data.find(NLTK_RESOURCES[name])
+            except LookupError:
+                raise LookupError(f"NLTK resource '{name}' could not be downloaded to {NLTK_DIR}; "
+                                  f"run `python -m utils.resources` on a machine with network access") from None
+
+
+def punkt_resource():
+    """Punkt resource used by the installed nltk (punkt_tab since nltk 3.8.2)."""
+    _nltk()
+    try:
+        from nltk.tokenize import PunktTokenizer
+        return "punkt_tab"
+    except ImportError:
+        return "punkt"
+
+
+def sentence_tokenizer():
+    """English Punkt sentence splitter, same as nltk.tokenize.sent_tokenize."""
+    nltk = _nltk()
+    with timed("load punkt"):
+        try:
+            # nltk >= 3.8.2 (punkt_tab resource)
+            from nltk.tokenize import PunktTokenizer
+            return PunktTokenizer("english").tokenize
+        except ImportError:
+            return nltk.data.load("tokenizers/punkt/english.pickle").tokenize
+
+
+def load_spacy(name, **kwargs):
+    """spaCy pipeline from the local cache, or the installed model package."""
+    spacy = lazy_import("spacy")
+    local = os.path.join(SPACY_DIR, name)
+    with timed(f"load {name}"):
+        return spacy.load(local if os.path.isdir(local) else name, **kwargs)
+
+
+def tokenizer_path(name):
+    """Local copy of a Hugging Face tokenizer if cached, else its hub name."""
+    local = os.path.join(TOKENIZER_DIR, name.replace("/", "--"))
+    return local if os.path.isdir(local) else name
+
+
+# Tokenizers loaded by this process, by (name, use_fast)
+_tokenizers = {}
+
+
+def load_tokenizer(name, use_fast=True):
+    """Hugging Face tokenizer from the local cache (fast Rust tokenizer where the model has one).
+
+    Loaded once per process and reused for every split / dataset.
+    """
+    key = (name, use_fast)
+    if key not in _tokenizers:
+        transformers = lazy_import("transformers")
+        with timed(f"load tokenizer {name}"):
+            _tokenizers[key] = transformers.AutoTokenizer.from_pretrained(tokenizer_path(name), use_fast=use_fast)
+    return _tokenizers[key]
+
+
+def fetch(nltk_names=(), spacy_models=(), tokenizers=()):
+    """Fill the local cache (needs network access for what is not installed)."""
+    if nltk_names:
+        ensure_nltk(*nltk_names)
+    for name in spacy_models:
+        target = os.path.join(SPACY_DIR, name)
+        if not os.path.isdir(target):
+            load_spacy(name).to_disk(target)
+    for name in tokenizers:
+        target = os.path.join(TOKENIZER_DIR, name.replace("/", "--"))
+        if not os.path.isdir(target):
+            transformers = lazy_import("transformers")
+            transformers.AutoTokenizer.from_pretrained(name).save_pretrained(target)
+    report_timings()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=f"Fill the local resource cache ({RESOURCE_DIR}).")
+    parser.add_argument("--nltk", nargs="*", default=None, help="NLTK resources")
+    parser.add_argument("--spacy", nargs="*", default=None, help="spaCy model packages")
+    parser.add_argument("--tokenizers", nargs="*", default=None, help="Hugging Face tokenizers")
+    args = parser.parse_args()
+
+    # Without any selection, fetch every resource of the pipeline
+    everything = args.nltk is None and args.spacy is None and args.tokenizers is None
+    fetch(
+        list(NLTK_RESOURCES) if everything else args.nltk or [],
+        SPACY_MODELS if everything else args.spacy or [],
+        TOKENIZERS if everything else args.tokenizers or [],
+    )
@@ -0,0 +1,226 @@
+"""Append-only store of JSON records split into size-bounded JSONL shards.
+
+A store is a directory:
+    manifest.json         committed shards with their record counts and sizes
+    shard-00000.jsonl     (or .jsonl.gz / .jsonl.zst)
+    shard-00001.jsonl
+    ...
+
+Records are buffered and written as complete gzip members / zstd frames,
+which both formats allow to be concatenated, so a shard can be appended to
+without rewriting it. Only what has been committed to the manifest is ever
+read back: a writer reopening a store after a crash cuts every shard back to
+its committed size and carries on from there.
+
+Usage:
+    with ShardWriter("data/raw/articles", compression="gz") as writer:
+        writer.write_all(records)
+        writer.commit()              # make everything written so far durable
+
+    for record in iter_records("data/raw/articles"):
+        ...
+"""
+import gzip
+import io
+import json
+import os
+
+from utils.compression import EXTENSIONS, compress, compression_of, zstandard
+
+MANIFEST_FILE = "manifest.json"
+
+
+def read_manifest(directory):
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        return {"shards": []}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST_FILE)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ShardWriter:
+    """Append records to a shard store.
+
+    A new shard is started once the current one holds `max_shard_bytes` of
+    uncompressed JSONL. Records become visible to readers on commit(), which
+    also happens automatically when a shard is full and on close().
+    With mode="w" an existing store is emptied first instead of appended to.
+    """
+
+    def __init__(self, directory, max_shard_bytes=64 * 1024 * 1024, compression=None,
+                 buffer_bytes=1024 * 1024, mode="a"):
+        if compression not in EXTENSIONS:
+            raise ValueError(f"Unknown compression: {compression}")
+        if compression == "zst":
+            zstandard()
+
+        self.directory = directory
+        self.max_shard_bytes = max_shard_bytes
+        self.compression = compression
+        self.buffer_bytes = buffer_bytes
+        os.makedirs(directory, exist_ok=True)
+
+        if mode == "w":
+            _write_manifest(directory, {"shards": []})
+        elif mode != "a":
+            raise ValueError(f"Unknown mode: {mode}")
+
+        self.manifest = read_manifest(directory)
+        self._discard_uncommitted()
+
+        # Records written but not committed yet
+        self.buffer = []
+        self.buffered = 0
+        self.pending_records = 0
+        self.pending_bytes = 0
+
+        self.file = None
+        self.shard = None
+
+        # Keep appending to the last shard if it has room and the same compression
+        shards = self.manifest["shards"]
+        if shards and shards[-1]["bytes"] < max_shard_bytes \
+                and compression_of(shards[-1]["file"]) == compression:
+            self.shard = shards[-1]
+            self.file = open(os.path.join(directory, self.shard["file"]), "ab")
+
+    def _discard_uncommitted(self):
+        # Anything not covered by the manifest is a leftover of an interrupted writer
+        committed = {shard["file"]: shard for shard in self.manifest["shards"]}
+        for filename in os.listdir(self.directory):
+            if not filename.startswith("shard-"):
+                continue
+            path = os.path.join(self.directory, filename)
+            shard = committed.get(filename)
+            if shard is None:
+                os.remove(path)
+            elif os.path.getsize(path) > shard["stored_bytes"]:
+                with open(path, "rb+") as f:
+                    f.truncate(shard["stored_bytes"])
+
+    @property
+    def records(self):
+        """Number of committed records in the store."""
+        return sum(shard["records"] for shard in self.manifest["shards"])
+
+    def _new_shard(self):
+        index = len(self.manifest["shards"])
+        self.shard = {"file": f"shard-{index:05d}{EXTENSIONS[self.compression]}",
+                      "records": 0, "bytes": 0, "stored_bytes": 0}
+        self.manifest["shards"].append(self.shard)
+        self.file = open(os.path.join(self.directory, self.shard["file"]), "ab")
+
+    def _flush_buffer(self):
+        if not self.buffer:
+            return
+        if self.file is None:
+            self._new_shard()
+        data = b"".join(self.buffer)
+        self.file.write(compress(data, self.compression))
+        self.pending_records += len(self.buffer)
+        self.pending_bytes += len(data)
+        self.buffer = []
+        self.buffered = 0
+
+    def write(self, record):
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        self.buffer.append(line)
+        self.buffered += len(line)
+
+        shard_bytes = (self.shard["bytes"] if self.shard else 0) + self.pending_bytes
+        if shard_bytes + self.buffered >= self.max_shard_bytes:
+            # Shard full: seal it, the next record starts a new one
+            self.commit()
+            self.file.close()
+            self.file = None
+            self.shard = None
+        elif self.buffered >= self.buffer_bytes:
+            self._flush_buffer()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+
+    def commit(self):
+        """Make every record written so far durable and visible to readers."""
+        self._flush_buffer()
+        if self.file is None:
+            return
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.shard["records"] += self.pending_records
+        self.shard["bytes"] += self.pending_bytes
+        self.shard["stored_bytes"] = self.file.tell()
+        self.pending_records = 0
+        self.pending_bytes = 0
+        self.manifest["compression"] = self.compression
+        _write_manifest(self.directory, self.manifest)
+
+    def close(self):
+        self.commit()
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class _BoundedReader(io.RawIOBase):
+    # Exposes only the committed prefix of a shard file
+    def __init__(self, f, limit):
+        self.f = f
+        self.remaining = limit
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.f.close()
+        super().close()
+
+    def readinto(self, b):
+        n = min(len(b), self.remaining)
+        if n == 0:
+            return 0
+        data = self.f.read(n)
+        b[:len(data)] = data
+        self.remaining -= len(data)
+        return len(data)
+
+
+def _open_shard(path, stored_bytes):
+    raw = io.BufferedReader(_BoundedReader(open(path, "rb"), stored_bytes))
+    compression = compression_of(path)
+    if compression == "gz":
+        return gzip.GzipFile(fileobj=raw, mode="rb")
+    if compression == "zst":
+        return zstandard().ZstdDecompressor().stream_reader(raw, read_across_frames=True)
+    return raw
+
+
+def iter_records(directory):
+    """Stream every committed record of a shard store, in write order."""
+    for shard in read_manifest(directory)["shards"]:
+        path = os.path.join(directory, shard["file"])
+        with _open_shard(path, shard["stored_bytes"]) as f:
+            for line in io.TextIOWrapper(f, encoding="utf-8"):
+                yield json.loads(line)
+
+
+def count_records(directory):
+    """Number of committed records, read from the manifest."""
+    return sum(shard["records"] for shard in read_manifest(directory)["shards"])
@@ -0,0 +1,113 @@
+"""Frequency counting over streams of documents, exact or in bounded memory.
+
+ExactCounter keeps a Counter of every distinct item (mentions and number of
+documents). SketchCounter keeps the `capacity` most frequent items with the
+SpaceSaving algorithm and estimates document frequencies with a Count-Min
+sketch, so its memory does not depend on the size of the corpus:
+- every item occurring more than N / capacity times (N = total mentions) is
+  kept, and its count is overestimated by at most N / capacity;
+- document frequencies are overestimated by at most e * D / width with
+  probability 1 - exp(-depth) (D = number of documents counted).
+
+Usage:
+    counter = SketchCounter(capacity=20000)
+    for entry in records:
+        counter.add_document(entry["entities"])
+    counter.most_common(350)  # [(item, mentions, documents), ...]
+"""
+import hashlib
+import heapq
+from collections import Counter
+
+import numpy as np
+
+
+class SpaceSaving:
+    """Top-k heavy hitters of a stream with at most `capacity` counters."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.counts = {}
+        # Maximum overestimation of every count
+        self.errors = {}
+        # (count, item) entries; outdated entries are skipped when popped
+        self._heap = []
+
+    def add(self, item, count=1):
+        if item in self.counts:
+            self.counts[item] += count
+        elif len(self.counts) < self.capacity:
+            self.counts[item] = count
+            self.errors[item] = 0
+        else:
+            # The new item takes over the counter of the least frequent item
+            while True:
+                smallest, victim = heapq.heappop(self._heap)
+                if self.counts.get(victim) == smallest:
+                    break
+            del self.counts[victim]
+            del self.errors[victim]
+            self.counts[item] = smallest + count
+            self.errors[item] = smallest
+        heapq.heappush(self._heap, (self.counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._heap = [(count, item) for item, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def most_common(self, k=None):
+        items = sorted(self.counts.items(), key=lambda kv: -kv[1])
+        return items if k is None else items[:k]
+
+
+class CountMinSketch:
+    """Approximate counts of any number of items in a depth x width array."""
+
+    def __init__(self, width=1 << 18, depth=4):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64)
+        self.rows = np.arange(depth)
+
+    def _columns(self, items):
+        # One independent 32 bit hash per row, cut from a single digest per item
+        digests = b"".join(hashlib.blake2b(item.encode("utf-8"), digest_size=4 * self.depth).digest()
+                           for item in items)
+        return np.frombuffer(digests, dtype=np.uint32).reshape(-1, self.depth) % self.width
+
+    def add(self, item, count=1):
+        self.add_all([item], count)
+
+    def add_all(self, items, count=1):
+        """Add `count` to every item of `items`."""
+        columns = self._columns(items)
+        np.add.at(self.table, (np.broadcast_to(self.rows, columns.shape), columns), count)
+
+    def estimate(self, item):
+        return int(self.table[self.rows, self._columns([item])[0]].min())
+
+
+class ExactCounter:
+    def __init__(self):
+        self.mentions = Counter()
+        self.documents = Counter()
+
+    def add_document(self, items):
+        self.mentions.update(items)
+        self.documents.update(set(items))
+
+    def most_common(self, k=None):
+        return [(item, count, self.documents[item]) for item, count in self.mentions.most_common(k)]
+
+
+class SketchCounter:
+    def __init__(self, capacity=20000, width=1 << 18, depth=4):
+        self.mentions = SpaceSaving(capacity)
+        self.documents = CountMinSketch(width, depth)
+
+    def add_document(self, items):
+        for item in items:
+            self.mentions.add(item)
+        self.documents.add_all(set(items))
+
+    def most_common(self, k=None):
+        return [(item, count, self.documents.estimate(item)) for item, count in self.mentions.most_common(k)]
@@ -0,0 +1,72 @@
+"""Deterministic train / val / test splits grouped by PMID.
+
+Every abstract yields many examples (one per entity, keyword, ...), and a
+random split over examples puts the same abstract in training and in
+evaluation. Here the split of an example only depends on its group, the PMID
+of its abstract: the PMID is hashed (blake2b, with a seed) to a number in
+[0, 1) and the split is the bucket that number falls in. So:
+
+- all examples of an abstract are in the same split (no leakage),
+- a PMID keeps its split across runs, machines and corpus sizes (adding
+  abstracts does not move the others),
+- records are split one at a time, streaming, without loading the corpus.
+
+    counts = split_jsonl(path, {"train": ..., "val": ..., "test": ...})
+
+Records without a PMID are grouped by their target text. Split sizes follow
+the fractions up to the variance of the hash over the PMIDs (and the number
+of examples per abstract).
+"""
+import hashlib
+from bisect import bisect_right
+from contextlib import ExitStack
+
+from utils.jsonl import JsonlWriter, iter_jsonl
+
+# Split name -> fraction of the groups
+SPLITS = {"train": 0.8, "val": 0.1, "test": 0.1}
+
+# Changing the seed draws a different split
+SEED = "btg-split-v1"
+
+
+def group_of(record):
+    """Group of a record: its PMID, else its target text."""
+    pmid = record.get("pmid")
+    return str(pmid) if pmid is not None else record.get("target", "")
+
+
+class Splitter:
+    def __init__(self, fractions=SPLITS, seed=SEED):
+        total = sum(fractions.values())
+        if not fractions or total <= 0 or min(fractions.values()) < 0:
+            raise ValueError(f"Invalid split fractions: {fractions}")
+        self.names = list(fractions)
+        self.seed = seed.encode("utf-8")
+        # Upper bounds of the buckets of the first splits; the last one takes the rest
+        self.bounds = []
+        cumulative = 0.0
+        for name in self.names[:-1]:
+            cumulative += fractions[name] / total
+            self.bounds.append(cumulative)
+
+    def split_of(self, group):
+        digest = hashlib.blake2b(group.encode("utf-8"), digest_size=8, key=self.seed).digest()
+        position = int.from_bytes(digest, "little") / 2 ** 64
+        return self.names[bisect_right(self.bounds, position)]
+
+
+def split_jsonl(path, output_paths, fractions=SPLITS, seed=SEED, group=group_of):
+    """Stream the records of `path` into one JSONL file per split; returns split -> count.
+
+    `output_paths` maps every split name of `fractions` to its output file.
+    """
+    splitter = Splitter(fractions, seed)
+    counts = dict.fromkeys(splitter.names, 0)
+    with ExitStack() as stack:
+        writers = {name: stack.enter_context(JsonlWriter(output_paths[name])) for name in splitter.names}
+        for record in iter_jsonl(path):
+            name = splitter.split_of(group(record))
+            writers[name].write(record)
+            counts[name] += 1
+    return counts
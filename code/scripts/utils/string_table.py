@@ -0,0 +1,42 @@
+"""Memory-mapped tables of utf-8 strings.
+
+A table `name` in a directory is two files:
+
+    <name>.bin          the strings, utf-8, concatenated
+    <name>_offsets.npy  int64 start of every string, plus the end of the last
+
+    write_strings(directory, "pmids", pmids)
+    table = StringTable(directory, "pmids")
+    table[i], len(table)
+
+Opening a table maps the files, and reading a string touches only its bytes.
+The entity index (utils/entity_index.py) and the abstract table
+(utils/text_table.py) are built from them.
+"""
+import os
+
+import numpy as np
+
+
+def write_strings(directory, name, strings):
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        f.write(b"".join(encoded))
+    np.save(os.path.join(directory, f"{name}_offsets.npy"), offsets)
+
+
+class StringTable:
+    """Memory-mapped table of utf-8 strings."""
+
+    def __init__(self, directory, name):
+        self.offsets = np.load(os.path.join(directory, f"{name}_offsets.npy"), mmap_mode="r")
+        path = os.path.join(directory, f"{name}.bin")
+        self.data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, np.uint8)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].tobytes().decode("utf-8")
@@ -0,0 +1,161 @@
+"""PMID-keyed table of the abstracts the training sets are built from.
+
+Summarization records can be reference records, i.e. the PMID and the
+prompt fields of an example (`{"pmid": ..., "input": ...}`), instead of
+copying the abstract into every record, with every distinct abstract stored
+once in this table. Consumers resolve the text when they read the records:
+
+    table = TextTable("data/training/abstracts")
+    for record in resolve(jsonlines.open(path), table):  # sets record["target"]
+        ...
+
+sum_tokenize.py resolves the summarization records this way. The text_gen
+and QA builders still write self-contained records, since their readers
+(the text_gen_final / gpt_final notebooks) expect the "target" field.
+
+The table is a directory of memory-mapped arrays (string tables of
+utils/string_table.py):
+
+    pmids.bin, pmids_offsets.npy  PMIDs, sorted
+    text_ids.npy                  text id of every PMID
+    texts.bin, texts_offsets.npy  distinct texts, utf-8, concatenated
+    meta.json                     counts
+
+so opening it costs nothing and a lookup is a binary search over the PMIDs.
+Identical abstracts of different PMIDs share a text id.
+
+04_dataset_creation/abstract_table.py builds it from the cleaned store.
+"""
+import hashlib
+import json
+import os
+import shutil
+from array import array
+from bisect import bisect_left
+
+import numpy as np
+
+from utils.string_table import StringTable, write_strings
+
+META_FILE = "meta.json"
+
+
+class TextTableWriter:
+    """Writes (pmid, text) pairs; texts are streamed to disk as they are added.
+
+    Memory grows with the number of PMIDs and distinct texts (a 16 byte
+    digest per text), not with the size of the texts. Later texts of a PMID
+    already added are ignored.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.tmp_dir = directory.rstrip("/") + ".tmp"
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.texts = open(os.path.join(self.tmp_dir, "texts.bin"), "wb")
+        self.text_offsets = array("q", [0])
+        self.digests = {}
+        self.pmid_to_text = {}
+
+    def add(self, pmid, text):
+        if pmid in self.pmid_to_text:
+            return
+        data = text.encode("utf-8")
+        digest = hashlib.blake2b(data, digest_size=16).digest()
+        text_id = self.digests.get(digest)
+        if text_id is None:
+            text_id = self.digests[digest] = len(self.text_offsets) - 1
+            self.texts.write(data)
+            self.text_offsets.append(self.text_offsets[-1] + len(data))
+        self.pmid_to_text[pmid] = text_id
+
+    def close(self):
+        self.texts.close()
+        pmids = sorted(self.pmid_to_text)
+        write_strings(self.tmp_dir, "pmids", pmids)
+        np.save(os.path.join(self.tmp_dir, "text_ids.npy"),
+                np.array([self.pmid_to_text[pmid] for pmid in pmids], dtype=np.int64))
+        np.save(os.path.join(self.tmp_dir, "texts_offsets.npy"), np.frombuffer(self.text_offsets, dtype=np.int64))
+        with open(os.path.join(self.tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"pmids": len(pmids), "texts": len(self.text_offsets) - 1,
+                       "bytes": self.text_offsets[-1]}, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_dir, self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.texts.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class TextTable:
+    def __init__(self, directory):
+        self.directory = directory
+        self.pmid_table = StringTable(directory, "pmids")
+        self.text_ids = np.load(os.path.join(directory, "text_ids.npy"), mmap_mode="r")
+        self.texts = StringTable(directory, "texts")
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+
+    def __len__(self):
+        return len(self.pmid_table)
+
+    # Pickled by path (e.g. when sent to worker processes), which map the
+    # files again instead of receiving a copy of the texts
+    def __getstate__(self):
+        return self.directory
+
+    def __setstate__(self, directory):
+        self.__init__(directory)
+
+    def _row(self, pmid):
+        i = bisect_left(self.pmid_table, pmid)
+        return i if i < len(self.pmid_table) and self.pmid_table[i] == pmid else None
+
+    def __contains__(self, pmid):
+        return self._row(pmid) is not None
+
+    def text_id(self, pmid):
+        """Id of the text of a PMID (shared by identical texts), or None."""
+        row = self._row(pmid)
+        return None if row is None else int(self.text_ids[row])
+
+    def get(self, pmid, default=None):
+        text_id = self.text_id(pmid)
+        return default if text_id is None else self.texts[text_id]
+
+    def __getitem__(self, pmid):
+        text_id = self.text_id(pmid)
+        if text_id is None:
+            raise KeyError(pmid)
+        return self.texts[text_id]
+
+    def pmids(self):
+        """All PMIDs of the table, sorted."""
+        return (self.pmid_table[i] for i in range(len(self.pmid_table)))
+
+
+def resolve(records, table, fields=("target",)):
+    """Yield the reference records with every field of `fields` set to the text of their PMID.
+
+    Fields a record already has are left as they are, so records written
+    before the table existed pass through unchanged.
+    """
+    for record in records:
+        missing = [field for field in fields if field not in record]
+        if missing:
+            if table is None:
+                raise ValueError(f"Record of PMID {record.get('pmid')} has no {', '.join(missing)} and no "
+                                 f"abstract table was given to resolve it from; build the table with "
+                                 f"04_dataset_creation/abstract_table.py")
+            text = table[record["pmid"]]
+            for field in missing:
+                record[field] = text
+        yield record
@@ -0,0 +1,173 @@
+"""Tokenized datasets as flat, memory-mapped token arrays.
+
+Every column (input_ids, labels) is stored as the concatenation of the token
+ids of all examples, plus the offsets of the examples in it:
+
+    input_ids.bin, input_ids_offsets.npy  token ids (uint16 if the vocabulary
+    labels.bin, labels_offsets.npy        fits, else int32), int64 offsets
+    meta.json                             examples, columns, dtype
+
+Opening a dataset maps the files: nothing is read or copied until a batch is
+assembled, and DataLoader workers (the dataset is pickled by path) share the
+same pages of the page cache. An example is a dict of array views and a
+batch is gathered from the flat arrays straight into its padded array:
+
+    ds = TokenArrays("data/tokenized/biobart_sum/test")
+    batch = ds.batch(indices, pad_token_id=tokenizer.pad_token_id)
+    torch.from_numpy(batch["input_ids"])          # no copy
+
+Given a pad token id, a DataLoader with a batch sampler fetches whole
+batches the same way (torch calls __getitems__ with the indices of a batch):
+
+    ds = TokenArrays(path, pad_token_id=tokenizer.pad_token_id, pad_to_multiple_of=8)
+    DataLoader(ds, batch_sampler=LengthBucketSampler(ds.lengths(), 16), collate_fn=to_tensors)
+
+04_dataset_creation/summarization/sum_tokenize.py writes them.
+"""
+import json
+import os
+import shutil
+from itertools import chain
+
+import numpy as np
+
+from utils.batching import LABEL_PAD_ID
+
+META_FILE = "meta.json"
+
+COLUMNS = ("input_ids", "labels")
+
+
+def token_dtype(vocab_size):
+    """Smallest dtype holding every token id of a vocabulary."""
+    return np.uint16 if vocab_size <= np.iinfo(np.uint16).max + 1 else np.int32
+
+
+class TokenArrayWriter:
+    """Appends tokenized examples to the flat arrays of a dataset directory.
+
+    Token ids are streamed to disk; memory holds the offsets only (8 bytes
+    per example and column). The dataset is written to a temporary directory
+    and moved in place on close.
+    """
+
+    def __init__(self, directory, vocab_size, columns=COLUMNS):
+        self.directory = directory
+        self.tmp_dir = directory.rstrip("/") + ".tmp"
+        self.columns = columns
+        self.dtype = np.dtype(token_dtype(vocab_size))
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+        os.makedirs(self.tmp_dir)
+        self.files = {column: open(os.path.join(self.tmp_dir, f"{column}.bin"), "wb") for column in columns}
+        self.offsets = {column: [np.zeros(1, dtype=np.int64)] for column in columns}
+        self.ends = dict.fromkeys(columns, 0)
+        self.count = 0
+
+    def add_batch(self, batch):
+        """Add the examples of a batch of columns (e.g. {"input_ids": [[...], ...], "labels": [...]})."""
+        size = len(batch[self.columns[0]])
+        if any(len(batch[column]) != size for column in self.columns):
+            raise ValueError("All columns of a batch must have the same number of examples")
+        for column in self.columns:
+            sequences = batch[column]
+            lengths = np.fromiter(map(len, sequences), dtype=np.int64, count=size)
+            total = int(lengths.sum())
+            np.fromiter(chain.from_iterable(sequences), dtype=self.dtype, count=total).tofile(self.files[column])
+            self.offsets[column].append(self.ends[column] + np.cumsum(lengths))
+            self.ends[column] += total
+        self.count += size
+
+    def add(self, example):
+        self.add_batch({column: [example[column]] for column in self.columns})
+
+    def close(self):
+        for column in self.columns:
+            self.files[column].close()
+            np.save(os.path.join(self.tmp_dir, f"{column}_offsets.npy"), np.concatenate(self.offsets[column]))
+        with open(os.path.join(self.tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"examples": self.count, "columns": list(self.columns), "dtype": self.dtype.name}, f)
+
+        shutil.rmtree(self.directory, ignore_errors=True)
+        os.replace(self.tmp_dir, self.directory)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for f in self.files.values():
+                f.close()
+            shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+class TokenArrays:
+    """Memory-mapped tokenized dataset (usable as a map-style torch Dataset)."""
+
+    def __init__(self, directory, pad_token_id=None, pad_to_multiple_of=None):
+        self.directory = directory
+        # Padding of the batches fetched with __getitems__
+        self.pad_token_id = pad_token_id
+        self.pad_to_multiple_of = pad_to_multiple_of
+        with open(os.path.join(directory, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        self.columns = self.meta["columns"]
+        self.tokens, self.offsets = {}, {}
+        for column in self.columns:
+            path = os.path.join(directory, f"{column}.bin")
+            dtype = np.dtype(self.meta["dtype"])
+            self.tokens[column] = (np.memmap(path, dtype=dtype, mode="r") if os.path.getsize(path)
+                                   else np.zeros(0, dtype=dtype))
+            self.offsets[column] = np.load(os.path.join(directory, f"{column}_offsets.npy"), mmap_mode="r")
+
+    def __len__(self):
+        return self.meta["examples"]
+
+    # Pickled by path (e.g. when sent to DataLoader workers), which map the
+    # files again and share their pages
+    def __getstate__(self):
+        return self.directory, self.pad_token_id, self.pad_to_multiple_of
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+    def lengths(self, column="input_ids"):
+        """Number of tokens of every example."""
+        return np.diff(self.offsets[column])
+
+    def __getitem__(self, i):
+        """An example, as views into the mapped arrays."""
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        i %= len(self)
+        return {column: self.tokens[column][self.offsets[column][i]:self.offsets[column][i + 1]]
+                for column in self.columns}
+
+    def _gather(self, column, indices, pad_value, pad_to_multiple_of):
+        starts = np.asarray(self.offsets[column])[indices]
+        lengths = np.asarray(self.offsets[column])[indices + 1] - starts
+        width = int(lengths.max()) if len(lengths) else 0
+        if pad_to_multiple_of:
+            width = -(-width // pad_to_multiple_of) * pad_to_multiple_of
+        positions = np.arange(width)
+        mask = positions < lengths[:, None]
+        ids = np.full((len(indices), width), pad_value, dtype=np.int64)
+        # One gather from the mapped tokens into the padded batch
+        ids[mask] = self.tokens[column][(starts[:, None] + positions)[mask]]
+        return ids, mask
+
+    def batch(self, indices, pad_token_id, pad_to_multiple_of=None):
+        """Padded int64 arrays of the examples `indices`: input_ids, attention_mask and labels (padded with -100)."""
+        indices = np.asarray(indices, dtype=np.int64)
+        input_ids, mask = self._gather("input_ids", indices, pad_token_id, pad_to_multiple_of)
+        batch = {"input_ids": input_ids, "attention_mask": mask.astype(np.int64)}
+        if "labels" in self.columns:
+            batch["labels"], _ = self._gather("labels", indices, LABEL_PAD_ID, pad_to_multiple_of)
+        return batch
+
+    def __getitems__(self, indices):
+        """A whole padded batch, see batch() (used by torch's DataLoader)."""
+        if self.pad_token_id is None:
+            raise ValueError("Batches of a TokenArrays need its pad_token_id")
+        return self.batch(indices, self.pad_token_id, self.pad_to_multiple_of)
@@ -0,0 +1,100 @@
+"""Cache of tokenized datasets shared between models.
+
+A tokenized dataset depends on the tokenizer, the examples, the maximum
+length and the prompt prefix only, so it is stored once per
+
+    (tokenizer fingerprint, dataset fingerprint, max_length, prefix)
+
+under <cache dir>/<key>/ and every model using it gets a link to it. The
+tokenizer fingerprint hashes the tokenizer's vocabulary, merges,
+normalisation and special tokens, not its name. Models sharing a tokenizer
+(e.g. BART and BioBART variants with the same vocabulary) therefore reuse
+one artifact, and adding a model to a comparison only costs tokenization
+for a tokenizer not seen before.
+
+Usage:
+    cache = TokenizationCache("data/tokenized/cache")
+    path, hit = cache.get_or_build(tokenizer, data_fingerprint(train_records), 512, "",
+                                   build=write_dataset)   # build(out_dir) writes the dataset
+    cache.link(path, "data/tokenized/biobart_sum/train")
+"""
+import hashlib
+import json
+import os
+import shutil
+
+META_FILE = "cache_meta.json"
+
+
+def tokenizer_fingerprint(tokenizer):
+    """Hash of what a tokenizer does (not of its name)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(type(tokenizer).__name__.encode("utf-8"))
+    backend = getattr(tokenizer, "backend_tokenizer", None)
+    if backend is not None:
+        # Fast tokenizers: full serialisation (vocabulary, merges, normaliser, ...)
+        digest.update(backend.to_str().encode("utf-8"))
+    else:
+        digest.update(json.dumps(sorted(tokenizer.get_vocab().items()), ensure_ascii=False).encode("utf-8"))
+    digest.update(json.dumps({name: str(token) for name, token in tokenizer.special_tokens_map.items()},
+                             sort_keys=True).encode("utf-8"))
+    digest.update(json.dumps([tokenizer.padding_side, tokenizer.truncation_side]).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def data_fingerprint(records, *extra):
+    """Hash of a sequence of JSON records (and of `extra` strings, e.g. the
+    fingerprint of the abstract table the records refer to)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for record in records:
+        digest.update(json.dumps(record, sort_keys=True, ensure_ascii=False).encode("utf-8"))
+        digest.update(b"\n")
+    for value in extra:
+        digest.update(str(value).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class TokenizationCache:
+    def __init__(self, directory):
+        self.directory = directory
+
+    def key(self, tokenizer, dataset_fingerprint, max_length, prefix=""):
+        parts = [tokenizer_fingerprint(tokenizer), dataset_fingerprint, str(max_length), prefix]
+        return hashlib.blake2b(json.dumps(parts).encode("utf-8"), digest_size=16).hexdigest()
+
+    def get_or_build(self, tokenizer, dataset_fingerprint, max_length, prefix, build):
+        """Path of the cached dataset, built with build(out_dir) on a miss; returns (path, hit)."""
+        key = self.key(tokenizer, dataset_fingerprint, max_length, prefix)
+        path = os.path.join(self.directory, key)
+        if os.path.exists(os.path.join(path, META_FILE)):
+            return path, True
+
+        # Built in a temporary directory and moved in place: an interrupted
+        # build never looks like a cached dataset
+        tmp_path = path + ".tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        build(tmp_path)
+        with open(os.path.join(tmp_path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump({"tokenizer": getattr(tokenizer, "name_or_path", ""),
+                       "tokenizer_fingerprint": tokenizer_fingerprint(tokenizer),
+                       "dataset_fingerprint": dataset_fingerprint,
+                       "max_length": max_length, "prefix": prefix}, f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+        return path, False
+
+    @staticmethod
+    def link(path, target):
+        """Make `target` (e.g. data/tokenized/<model>/<split>) point to a cached dataset.
+
+        A relative symlink where the file system supports it, else a copy.
+        """
+        if os.path.islink(target) or os.path.isfile(target):
+            os.remove(target)
+        elif os.path.isdir(target):
+            shutil.rmtree(target)
+        os.makedirs(os.path.dirname(target) or ".", exist_ok=True)
+        try:
+            os.symlink(os.path.relpath(path, os.path.dirname(target) or "."), target, target_is_directory=True)
+        except OSError:
+            shutil.copytree(path, target)